@@ -0,0 +1,91 @@
+# Import python libraries
+import sys
+import numpy as np
+
+# Algorithmic routing: Instead of storing a next hop for each (node, destination), the next hop is computed from the
+# ids of the current node and the destination chiplet. This is possible for regular topologies on a grid-placement
+# where chiplet-ids start in the bottom-left corner and are numbered in row-major order (see generate_topology.py).
+# Algorithmic routing tables have the following format:
+# {"type" : "algorithmic", "topology" : <topology>, "rows" : <rows>, "cols" : <cols>}
+# All next-hop functions take numpy arrays of current node-ids and destination node-ids and return the next node-ids.
+
+###############################################################################
+# Dimension-Order Routing
+###############################################################################
+
+# Mesh: Route along the row until the destination column is reached, then along the column
+def next_hops_mesh(rows, cols, cur, dst):
+	(cur_row, cur_col) = np.divmod(cur, cols)
+	(dst_row, dst_col) = np.divmod(dst, cols)
+	return np.where(cur_col != dst_col, cur + np.sign(dst_col - cur_col), cur + np.sign(dst_row - cur_row) * cols)
+
+# Torus: Same as in the mesh, but in each ring, the shorter direction is taken (ties are broken towards higher ids)
+def next_hops_torus(rows, cols, cur, dst):
+	(cur_row, cur_col) = np.divmod(cur, cols)
+	(dst_row, dst_col) = np.divmod(dst, cols)
+	def ring_step(cur_pos, dst_pos, size):
+		return np.where(2 * ((dst_pos - cur_pos) % size) <= size, (cur_pos + 1) % size, (cur_pos - 1) % size)
+	return np.where(cur_col != dst_col, cur_row * cols + ring_step(cur_col, dst_col, cols), ring_step(cur_row, dst_row, rows) * cols + cur_col)
+
+# Flattened Butterfly: Jump to the destination column in the current row, then to the destination row
+def next_hops_flattened_butterfly(rows, cols, cur, dst):
+	(cur_row, cur_col) = np.divmod(cur, cols)
+	dst_col = dst % cols
+	return np.where(cur_col != dst_col, cur_row * cols + dst_col, dst)
+
+# Hypercube: Flip the lowest bit in which the current node and the destination differ
+def next_hops_hypercube(rows, cols, cur, dst):
+	diff = cur ^ dst
+	return cur ^ (diff & -diff)
+
+algorithmic_routing_functions = {
+	"mesh" 					: next_hops_mesh,
+	"torus" 				: next_hops_torus,
+	"flattened_butterfly" 	: next_hops_flattened_butterfly,
+	"hypercube" 			: next_hops_hypercube,
+}
+
+###############################################################################
+# Interface
+###############################################################################
+
+# Create an algorithmic routing table for the given topology on a rows x cols grid
+def generate_algorithmic_routing(topology_name, rows, cols):
+	if topology_name not in algorithmic_routing_functions:
+		print("ERROR: Algorithmic routing is not supported for the topology %s. Supported topologies: %s" % (topology_name, ", ".join(algorithmic_routing_functions)))
+		sys.exit(1)
+	return {"type" : "algorithmic", "topology" : topology_name, "rows" : rows, "cols" : cols}
+
+# Check that an algorithmic routing table fits the design (see hlp.construct_node_index), returns a list of problems
+def check_algorithmic_routing(routing_table_, node_index):
+	problems = []
+	(topology_name, rows, cols) = (routing_table_["topology"], routing_table_["rows"], routing_table_["cols"])
+	if topology_name not in algorithmic_routing_functions:
+		problems.append("Algorithmic routing is not supported for the topology %s." % topology_name)
+	if len(node_index["nodes"]) != node_index["n_chiplets"]:
+		problems.append("Algorithmic routing does not support interposer-routers.")
+	if rows * cols != node_index["n_chiplets"]:
+		problems.append("Algorithmic routing for a %dx%d grid, but the design contains %d chiplets." % (rows, cols, node_index["n_chiplets"]))
+	if topology_name == "hypercube" and ((rows & (rows - 1)) != 0 or (cols & (cols - 1)) != 0):
+		problems.append("Algorithmic routing for a hypercube requires the number of rows and columns to be powers of two.")
+	return problems
+
+# Next hops (node-ids) for arrays of current node-ids and destination node-ids, -1 if the current node is the destination
+def compute_algorithmic_next_hops(routing_table_, cur_nodes, dst_nodes):
+	cur_nodes = np.asarray(cur_nodes, dtype = np.int64)
+	dst_nodes = np.asarray(dst_nodes, dtype = np.int64)
+	next_hop_function = algorithmic_routing_functions[routing_table_["topology"]]
+	nxt_nodes = next_hop_function(routing_table_["rows"], routing_table_["cols"], cur_nodes, dst_nodes)
+	return np.where(cur_nodes != dst_nodes, nxt_nodes, -1)
+
+# Expand an algorithmic routing table into a "default" routing table. This materializes a next hop for each
+# (node, destination), it is only used where a table is needed, e.g., for the BookSim simulation.
+def expand_algorithmic_routing(routing_table_):
+	n_chiplets = routing_table_["rows"] * routing_table_["cols"]
+	nodes = [("chiplet", cid) for cid in range(n_chiplets)]
+	table = {node : {} for node in nodes}
+	for did in range(n_chiplets):
+		nxt_nodes = compute_algorithmic_next_hops(routing_table_, np.arange(n_chiplets), np.full(n_chiplets, did)).tolist()
+		for (cid, nxt) in enumerate(nxt_nodes):
+			table[nodes[cid]][nodes[did]] = nodes[nxt] if nxt >= 0 else None
+	return {"type" : "default", "table" : table}
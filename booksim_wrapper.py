@@ -1,13 +1,109 @@
 # Import python libraries
+import os
+import sys
+import json
 import math
+import shutil
+import hashlib
+import itertools as it
+import tempfile
 import copy
 import subprocess
+import concurrent.futures
+import threading
+import numpy as np
 
 # Import RapidChiplet files
 import helpers as hlp
+import algorithmic_routing as ar
 
-# Export the BookSim configuration file
-def export_booksim_config(inputs, run_identifier, load):
+# Path of the BookSim executable
+booksim_exec_path = "booksim2/src/booksim"
+
+# Each BookSim simulation uses a private run directory such that concurrent simulations (of different designs, of the
+# same design, or of different loads) do not overwrite each other's files. The run directory contains the files below
+# and one configuration file per simulated load.
+booksim_file_names = {
+	"config" : "config.conf",
+	"topology" : "topology.anynet",
+	"routing_table" : "routing_table.json",
+	"traffic" : "traffic.json",
+	"trace" : "trace.json",
+}
+
+# Exported routing tables and traffic files are cached on disk by a hash of their content, such that simulations of
+# designs that share a topology and routing (or traffic) copy the cached file instead of exporting it again. Set
+# "export_cache_directory" in the BookSim configuration to another directory or to "none" to disable the cache.
+export_cache_dir = "./inputs/booksim_export_cache"
+export_cache_max_bytes = 2 ** 32
+
+# Copy the cached export with the given key to the save path, returns False if it is not cached
+def read_export_from_cache(inputs, key, save_path):
+	cache_dir = inputs["booksim_config"].get("export_cache_directory", export_cache_dir)
+	if cache_dir == "none":
+		return False
+	cache_file = os.path.join(cache_dir, key + os.path.splitext(save_path)[1])
+	# The cached file can be evicted by a concurrent simulation at any time
+	try:
+		shutil.copyfile(cache_file, save_path)
+		os.utime(cache_file)
+	except FileNotFoundError:
+		return False
+	return True
+
+# Add an exported file to the cache
+def write_export_to_cache(inputs, key, save_path):
+	cache_dir = inputs["booksim_config"].get("export_cache_directory", export_cache_dir)
+	if cache_dir == "none":
+		return
+	cache_file = os.path.join(cache_dir, key + os.path.splitext(save_path)[1])
+	# Write to a temporary file first, such that concurrent simulations never read a partially written file
+	os.makedirs(cache_dir, exist_ok = True)
+	temp_file = cache_file + ".%d.%d.tmp" % (os.getpid(), threading.get_ident())
+	shutil.copyfile(save_path, temp_file)
+	os.replace(temp_file, cache_file)
+	hlp.evict_cache_files(cache_dir, export_cache_max_bytes)
+
+# The exported routing table only depends on the BookSim topology (routers, nodes, and ports) and the next hops of the
+# routing table. The key is a hash of the exported topology file, the routing table type, and the array of next hops.
+def get_routing_table_export_key(inputs, intermediates, run_dir):
+	# Compute intermediates if not already computed
+	required_intermediates = ["next_hops"]
+	hlp.compute_required_intermediates(inputs, intermediates, required_intermediates)
+	next_hops = intermediates["next_hops"]
+	# Hash the inputs of the export
+	content_hash = hashlib.sha256()
+	with open(os.path.join(run_dir, booksim_file_names["topology"]), "rb") as file:
+		content_hash.update(file.read())
+	content_hash.update(inputs["routing_table"]["type"].encode())
+	if next_hops["type"] == "algorithmic":
+		content_hash.update(json.dumps(next_hops["routing_table"], sort_keys = True).encode())
+	else:
+		next_hops_array = np.ascontiguousarray(next_hops["next_hops"])
+		content_hash.update(str((next_hops_array.dtype.str, next_hops_array.shape)).encode())
+		content_hash.update(next_hops_array.tobytes())
+	return "routing_table_" + content_hash.hexdigest()
+
+# Create the run directory of a BookSim simulation. It is created in the "run_directory" of the BookSim configuration,
+# by default, in the temporary directory of the system.
+def create_run_directory(inputs, run_identifier):
+	# Read required inputs if not already present in inputs
+	required_inputs = ["booksim_config"]
+	hlp.read_required_inputs(inputs, required_inputs)
+	parent_directory = inputs["booksim_config"].get("run_directory", None)
+	if parent_directory is not None:
+		os.makedirs(parent_directory, exist_ok = True)
+	return tempfile.mkdtemp(prefix = "rc_booksim_%s_" % run_identifier, dir = parent_directory)
+
+# Remove the run directory of a BookSim simulation unless "keep_run_directory" is set in the BookSim configuration
+def remove_run_directory(inputs, run_dir):
+	if inputs["booksim_config"].get("keep_run_directory", False):
+		print("BookSim files are kept in %s" % run_dir) if inputs["verbose"] else None
+	else:
+		shutil.rmtree(run_dir, ignore_errors = True)
+
+# Export the BookSim configuration file (by default, to config.conf in the run directory)
+def export_booksim_config(inputs, run_dir, load, config_name = None):
 	# Read required inputs if not already present in inputs
 	required_inputs = ["booksim_config","chiplets","packaging","placement","routing_table"]
 	hlp.read_required_inputs(inputs, required_inputs)
@@ -21,6 +117,11 @@ def export_booksim_config(inputs, run_identifier, load):
 	# Remove parameters that are used by RapidChiplet and not by BookSim
 	del bsc["precision"]
 	del bsc["saturation_factor"]
+	bsc.pop("workers", None)
+	bsc.pop("search", None)
+	bsc.pop("run_directory", None)
+	bsc.pop("keep_run_directory", None)
+	bsc.pop("export_cache_directory", None)
 	# Determine router latency used in BookSim. This can be set manually in the BookSim configuration file
 	# If not specified, the average latency of chiplet-internal-routers and interposer-routers is used
 	if "router_latency" in bsc:
@@ -37,11 +138,12 @@ def export_booksim_config(inputs, run_identifier, load):
 			  "specify the parameter \"router_latency\" in the booksim-config input file.")
 	# 1) Simulation parameters
 	bsc["topology"] = "anynet" 
-	bsc["network_file"] = "booksim2/src/rc_topologies/%s.anynet" % run_identifier
-	bsc["routing_table_type"] = routing_table_type
-	bsc["routing_table_file"] = "booksim2/src/rc_routing_tables/%s.json" % run_identifier
-	bsc["traffic_file"] = "booksim2/src/rc_traffics/%s.json" % run_identifier
-	bsc["trace_file"] = "booksim2/src/rc_traces/%s.json" % run_identifier
+	bsc["network_file"] = os.path.join(run_dir, booksim_file_names["topology"])
+	# "compressed" routing tables are exported as "extended" routing tables, "algorithmic" ones as "default" tables
+	bsc["routing_table_type"] = {"compressed" : "extended", "algorithmic" : "default"}.get(routing_table_type, routing_table_type)
+	bsc["routing_table_file"] = os.path.join(run_dir, booksim_file_names["routing_table"])
+	bsc["traffic_file"] = os.path.join(run_dir, booksim_file_names["traffic"])
+	bsc["trace_file"] = os.path.join(run_dir, booksim_file_names["trace"])
 	bsc["injection_rate"] = 1.0 if bsc["mode"] == "trace" else load
 	# 3) Parameters related to the timing/latencies:
 	bsc["credit_delay "] = 0
@@ -60,7 +162,7 @@ def export_booksim_config(inputs, run_identifier, load):
 	# Convert configuration file to correct format
 	config_lines = [(key + " = " + str(bsc[key]) + ";") for key in bsc]
 	# Store the file
-	save_path = "booksim2/src/rc_configs/%s.conf" % run_identifier
+	save_path = os.path.join(run_dir, config_name if config_name is not None else booksim_file_names["config"])
 	with open(save_path, "w") as file:
 		for line in config_lines:
 			file.write(line + "\n")
@@ -71,7 +173,7 @@ def export_booksim_config(inputs, run_identifier, load):
 # Node-IDs are consecutive starting units of chiplet 0 to units of chiplet c-1
 # Router-latencies are the chiplets internal latency or the interposer-router latency
 # Link latencies are the sum of outgoing-phy-latency, link-latency, and incoming-phy-latency
-def export_booksim_topology(inputs, intermediates, run_identifier):
+def export_booksim_topology(inputs, intermediates, run_dir):
 	# Read required inputs
 	required_inputs = ["chiplets","placement","technologies","topology"]
 	hlp.read_required_inputs(inputs, required_inputs)
@@ -81,8 +183,9 @@ def export_booksim_topology(inputs, intermediates, run_identifier):
 	topology = inputs["topology"]
 	n_chiplets = len(placement["chiplets"])
 	# Compute intermediates
-	required_intermediates = ["link_latencies"]
+	required_intermediates = ["node_index", "link_latencies"]
 	hlp.compute_required_intermediates(inputs, intermediates, required_intermediates)
+	link_ids = intermediates["node_index"]["link_ids"]
 	link_latencies = intermediates["link_latencies"]
 	# Load or compute additional information 
 	ici_graph = hlp.construct_ici_graph(chiplets, placement, topology)
@@ -109,7 +212,7 @@ def export_booksim_topology(inputs, intermediates, run_identifier):
 		for (cnt, (otype, oid)) in enumerate(sorted(adj_list[("chiplet", cid)], key=lambda x: (0 if x[0] == "chiplet" else 1, x[1]))):
 			ophy_latency = technologies[chiplet["technology"]]["phy_latency"] if otype == "chiplet" else 0
 			bs_oid = oid if otype == "chiplet" else n_chiplets + oid
-			lat = phy_latency + link_latencies[(("chiplet",cid),(otype,oid))] + ophy_latency
+			lat = phy_latency + link_latencies[link_ids[(("chiplet",cid),(otype,oid))]].item() + ophy_latency
 			line += " router %d %d" % (bs_oid, lat)
 			port_map_entry[(otype,oid)] = chiplet["unit_count"] + cnt
 		topology_lines.append(line)
@@ -123,13 +226,13 @@ def export_booksim_topology(inputs, intermediates, run_identifier):
 		for (cnt, (otype, oid)) in enumerate(sorted(adj_list[("irouter",rid)], key=lambda x: (0 if x[0] == "chiplet" else 1, x[1]))):
 			ophy_latency = technologies[chiplet["technology"]]["phy_latency"] if otype == "chiplet" else 0
 			bs_oid = oid if otype == "chiplet" else n_chiplets + oid
-			lat = link_latencies[(("irouter",rid),(otype,oid))] + ophy_latency
+			lat = link_latencies[link_ids[(("irouter",rid),(otype,oid))]].item() + ophy_latency
 			line += " router %d %d" % (bs_oid, lat)
 			port_map_entry[(otype,oid)] = cnt
 		topology_lines.append(line)
 		port_map[("irouter",rid)] = port_map_entry
 	# Store the file
-	save_path = "booksim2/src/rc_topologies/%s.anynet" % run_identifier
+	save_path = os.path.join(run_dir, booksim_file_names["topology"])
 	with open(save_path, "w") as file:
 		for line in topology_lines:
 			file.write(line + "\n")
@@ -137,20 +240,43 @@ def export_booksim_topology(inputs, intermediates, run_identifier):
 	return port_map
 
 
+# Next hop of an "extended" or "compressed" routing table entry for packets coming from the given previous node
+def get_next_hop_by_prev(routing_table_type, entry, prev):
+	if routing_table_type == "compressed":
+		return entry["exceptions"].get(prev, entry["default"])
+	return entry[prev]
+
+# Previous nodes (excluding the injection) for which an "extended" or "compressed" routing table entry has a next hop.
+# In "extended" routing tables, only the listed previous nodes have a next hop, in "compressed" routing tables, all
+# neighbors in the port map do (units are attached to the local chiplet, packets from them are injected packets).
+def get_prevs(routing_table_type, entry, node_port_map):
+	if routing_table_type == "compressed":
+		return [prev for prev in node_port_map if prev[0] != "unit" and get_next_hop_by_prev(routing_table_type, entry, prev) is not None]
+	return [prev for prev in entry if prev != "-1"]
+
 # Export the routing table: Convert from RapidChiplet format to BookSim format
 # RapidChiplet routing table format: Uses pairs of type and if for cur, dst, next and prev.
 # "default"-mode: {(cur_type, cur_id) -> {(dst_type, dst_id) -> (next_type, next-id)}}
 # "extended"-mode: {(cur_type, cur_id) -> {(dst_type, dst_id) -> {(prev_type, prev_id) -> (next_type, next-id)}}}
+# "compressed"-mode: see hlp.compress_routing_table, it is exported in the BookSim "extended"-mode
 # BookSim routing table format: Uses router-ids for cur, next, and prev but uses node-ids for dst
 # "default"-mode: routing_table[cur_bs_rid] = {dst_bs_nid -> output_port}
 # "extended"-mode: routing_table[cur_bs_rid] = {dst_bs_nid -> {input_port -> output_port}}
-def export_routing_table(inputs, intermediates, port_map, run_identifier):
+def export_routing_table(inputs, intermediates, port_map, run_dir):
 	# Read required inputs
 	required_inputs = ["chiplets","placement","routing_table"]
 	hlp.read_required_inputs(inputs, required_inputs)
 	chiplets = inputs["chiplets"]
 	placement = inputs["placement"]
 	routing_table_ = inputs["routing_table"]
+	# Reuse a cached export of the same routing on the same BookSim topology
+	save_path = os.path.join(run_dir, booksim_file_names["routing_table"])
+	key = get_routing_table_export_key(inputs, intermediates, run_dir)
+	if read_export_from_cache(inputs, key, save_path):
+		return
+	# BookSim needs a next hop for each (node, destination), hence, algorithmic routing tables are expanded
+	if routing_table_["type"] == "algorithmic":
+		routing_table_ = ar.expand_algorithmic_routing(routing_table_)
 	routing_table_type = routing_table_["type"]
 	routing_table = routing_table_["table"]
 	n_chiplets = len(placement["chiplets"])
@@ -191,20 +317,20 @@ def export_routing_table(inputs, intermediates, port_map, run_identifier):
 				if routing_table_type == "default":
 					(next_type, next_id) = routing_table[("chiplet",cid)][("chiplet",units_partent_cid)]
 					sub_table[uid] = port_map[("chiplet",cid)][next_type,next_id]
-				# Extended routing table type: Next-hop depends on input port
-				elif routing_table_type == "extended":
+				# Extended or compressed routing table type: Next-hop depends on input port
+				elif routing_table_type in ["extended", "compressed"]:
+					entry = routing_table[("chiplet",cid)][("chiplet",units_partent_cid)]
 					sub_sub_table = {}
 					# Routing for packets that are injected at the current chiplet
 					for local_unit in range(chiplets[placement["chiplets"][cid]["name"]]["unit_count"]):
 						prev_port = port_map[("chiplet",cid)][("unit",next_local_unit_id + local_unit)]
-						(next_type, next_id) = routing_table[("chiplet",cid)][("chiplet",units_partent_cid)]["-1"]
+						(next_type, next_id) = get_next_hop_by_prev(routing_table_type, entry, "-1")
 						sub_sub_table[prev_port] = port_map[("chiplet",cid)][next_type,next_id]
 					# Routing for packets that are not injected at the current chiplet
-					for prev in routing_table[("chiplet",cid)][("chiplet",units_partent_cid)].keys():
-						if prev != "-1":
-							prev_port = port_map[("chiplet",cid)][prev]
-							(next_type, next_id) = routing_table[("chiplet",cid)][("chiplet",units_partent_cid)][prev]
-							sub_sub_table[prev_port] = port_map[("chiplet",cid)][next_type,next_id]
+					for prev in get_prevs(routing_table_type, entry, port_map[("chiplet",cid)]):
+						prev_port = port_map[("chiplet",cid)][prev]
+						(next_type, next_id) = get_next_hop_by_prev(routing_table_type, entry, prev)
+						sub_sub_table[prev_port] = port_map[("chiplet",cid)][next_type,next_id]
 					sub_table[uid] = sub_sub_table
 				else:
 					print("ERROR: Invalid routing table type \"%s\"" % routing_table_type)
@@ -222,11 +348,13 @@ def export_routing_table(inputs, intermediates, port_map, run_identifier):
 				(next_type, next_id) = routing_table[("irouter",rid)][("chiplet",unit_id_to_chiplet_id[uid])]
 				sub_table[uid] = port_map[("irouter",rid)][next_type,next_id]
 			# Extended routing table type: Next-hop depends on input port
-			elif routing_table_type == "extended":
+			# Extended or compressed routing table type: Next-hop depends on input port
+			elif routing_table_type in ["extended", "compressed"]:
+				entry = routing_table[("irouter",rid)][("chiplet",unit_id_to_chiplet_id[uid])]
 				sub_sub_table = {}
-				for (prev_type, prev_id) in port_map[("irouter",rid)].keys():
-					prev_port = port_map[("irouter",rid)][(prev_type,prev_id)]
-					(next_type, next_id) = routing_table[("irouter",rid)][("chiplet",unit_id_to_chiplet_id[uid])][(prev_type,prev_id)]
+				for prev in get_prevs(routing_table_type, entry, port_map[("irouter",rid)]):
+					prev_port = port_map[("irouter",rid)][prev]
+					(next_type, next_id) = get_next_hop_by_prev(routing_table_type, entry, prev)
 					sub_sub_table[prev_port] = port_map[("irouter",rid)][next_type,next_id]
 				sub_table[uid] = sub_sub_table
 			else:
@@ -235,38 +363,39 @@ def export_routing_table(inputs, intermediates, port_map, run_identifier):
 		# Order in the table specified the router to which this sub-table belongs
 		bs_routing_table.append(sub_table)
 	# Store the file
-	save_path = "booksim2/src/rc_routing_tables/%s.json" % run_identifier
 	hlp.write_json(save_path, bs_routing_table)
+	write_export_to_cache(inputs, key, save_path)
 
 # Export the traffic file for BookSim
-def export_traffic(inputs, intermediates, run_identifier):
+def export_traffic(inputs, intermediates, run_dir):
 	# Read required inputs
 	required_inputs = ["chiplets","placement","traffic_by_unit"]
 	hlp.read_required_inputs(inputs, required_inputs)
 	chiplets = inputs["chiplets"]
 	placement = inputs["placement"]
 	traffic_by_unit = inputs["traffic_by_unit"]
-	# Construct a map that maps (chiplet-id, unit-id)-pairs to the corresponding BookSim node-id
-	cid_and_uid_to_bsnid = {}
-	n_nodes = 0
-	for (cid, chiplet_desc) in enumerate(placement["chiplets"]):
-		chiplet = chiplets[chiplet_desc["name"]]
-		for uid in range(chiplet["unit_count"]):
-			cid_and_uid_to_bsnid[(cid,uid)] = n_nodes 
-			n_nodes += 1
-	# Construct the traffic file for BookSim
+	# The BookSim node-id of (chiplet-id, unit-id) is the first node-id of the chiplet plus the unit-id
+	unit_counts = [chiplets[chiplet_desc["name"]]["unit_count"] for chiplet_desc in placement["chiplets"]]
+	first_bsnids = np.concatenate(([0], np.cumsum(unit_counts)[:-1])).astype(int)
+	n_nodes = sum(unit_counts)
+	# Construct the traffic matrix for BookSim
 	# Index corresponds to the sending chiplet/router
-	bs_traffic = [[0.0 for i in range(n_nodes)] for i in range(n_nodes)]
-	for ((scid,suid),(dcid,duid)) in traffic_by_unit.keys():
-		bs_snid = cid_and_uid_to_bsnid[(scid,suid)]
-		bs_dnid = cid_and_uid_to_bsnid[(dcid,duid)]
-		bs_traffic[bs_snid][bs_dnid] = traffic_by_unit[(scid,suid),(dcid,duid)]
+	endpoints = np.fromiter(it.chain.from_iterable(it.chain.from_iterable(traffic_by_unit.keys())), dtype = int, count = 4 * len(traffic_by_unit)).reshape(-1, 4)
+	bs_traffic = np.zeros((n_nodes, n_nodes))
+	bs_snids = first_bsnids[endpoints[:,0]] + endpoints[:,1]
+	bs_dnids = first_bsnids[endpoints[:,2]] + endpoints[:,3]
+	bs_traffic[bs_snids, bs_dnids] = np.fromiter(traffic_by_unit.values(), dtype = float, count = len(traffic_by_unit))
+	# Reuse a cached export of the same traffic, the key is a hash of the traffic matrix
+	save_path = os.path.join(run_dir, booksim_file_names["traffic"])
+	key = "traffic_%s" % hashlib.sha256(str(bs_traffic.shape).encode() + bs_traffic.tobytes()).hexdigest()
+	if read_export_from_cache(inputs, key, save_path):
+		return
 	# Store the file
-	save_path = "booksim2/src/rc_traffics/%s.json" % run_identifier
-	hlp.write_json(save_path, bs_traffic)
+	hlp.write_json(save_path, bs_traffic.tolist())
+	write_export_to_cache(inputs, key, save_path)
 
 # Export the trace file for BookSim
-def export_trace(inputs, intermediates, run_identifier):
+def export_trace(inputs, intermediates, run_dir):
 	# Read required inputs
 	required_inputs = ["chiplets","placement","trace"]
 	hlp.read_required_inputs(inputs, required_inputs)
@@ -299,7 +428,7 @@ def export_trace(inputs, intermediates, run_identifier):
 	for packet in bs_trace:
 		packet["num_deps"] = num_deps[packet["id"]]
 	# Store the file
-	save_path = "booksim2/src/rc_traces/%s.json" % run_identifier
+	save_path = os.path.join(run_dir, booksim_file_names["trace"])
 	hlp.write_json(save_path, bs_trace)
 
 # Print BookSim errors
@@ -342,81 +471,215 @@ def read_booksim_results(out):
 			results["total_run_time_cycles"] = float(line.split(" ")[6])
 	return results
 
+# Run BookSim on a configuration file and return its output (stdout, stderr, exceeded). The output is read line by line
+# while BookSim runs: BookSim reports the packet latency after each sample period, if it exceeds the latency limit, the
+# network is saturated, the process is killed, and exceeded is True. Returns None if the run was stopped through the
+# stop event, in which case the BookSim process is killed as well.
+def run_booksim_process(config_path, stop, latency_limit = None):
+	with tempfile.TemporaryFile() as err_file:
+		proc = subprocess.Popen([booksim_exec_path, config_path], stdout=subprocess.PIPE, stderr=err_file)
+		watcher = threading.Thread(target = kill_booksim_process_when_stopped, args = (proc, stop))
+		watcher.start()
+		out_lines = []
+		exceeded = False
+		with proc.stdout:
+			for line in proc.stdout:
+				out_lines.append(line)
+				if latency_limit is not None and line.startswith(b"Packet latency average = ") and float(line.split()[4]) > latency_limit:
+					exceeded = True
+					proc.kill()
+					break
+		proc.wait()
+		watcher.join()
+		if stop.is_set():
+			return None
+		err_file.seek(0)
+		return (b"".join(out_lines), err_file.read(), exceeded)
+
+# Kill a BookSim process as soon as the stop event is set
+def kill_booksim_process_when_stopped(proc, stop):
+	while proc.poll() is None:
+		if stop.wait(0.1):
+			proc.kill()
+
+# Loads of one level of the load sweep: Starting at first_load, the load is increased by the granularity up to 0.999
+def get_sweep_loads(first_load, granularity):
+	loads = [first_load]
+	while loads[-1] < 0.999:
+		loads.append(min(loads[-1] + granularity, 0.999))
+	return loads
+
+# Simulate the given loads in ascending order with up to <workers> concurrent BookSim processes, stopping at the first
+# load where the network is saturated or where the simulation fails. Runs of higher loads are cancelled as soon as
+# such a load is found. A run is saturated if BookSim reports an unstable simulation or if the packet latency exceeds
+# <saturation_factor> times the zero-load latency (runs are killed as soon as this happens). Returns the results of all
+# stable loads below that load (and of the load itself if only its final latency was too high), and the load and reason
+# ("saturated" or "failed") where the sweep stopped.
+def run_booksim_loads(inputs, run_dir, loads, zero_load_latency, workers):
+	booksim_config = inputs["booksim_config"]
+	saturation_factor = booksim_config["saturation_factor"]
+	latency_limit = zero_load_latency * saturation_factor if zero_load_latency is not None else None
+	results = {}
+	(stop_load, stop_reason) = (None, None)
+	pending = list(loads)
+	running = {}
+	stops = {}
+	with concurrent.futures.ThreadPoolExecutor(max_workers = workers) as executor:
+		while len(pending) > 0 or len(running) > 0:
+			# Start new runs while there are free workers, each run uses its own configuration file
+			while len(pending) > 0 and len(running) < workers and (stop_load is None or pending[0] < stop_load):
+				load = pending.pop(0)
+				print("Running BookSim simulation with load %.3f" % load) if inputs["verbose"] else None
+				config_name = "config_%.6f.conf" % load
+				export_booksim_config(inputs, run_dir, load, config_name)
+				stops[load] = threading.Event()
+				running[executor.submit(run_booksim_process, os.path.join(run_dir, config_name), stops[load], latency_limit)] = load
+			if len(running) == 0:
+				break
+			# Process the results of completed runs
+			(done, not_done) = concurrent.futures.wait(running, return_when = concurrent.futures.FIRST_COMPLETED)
+			for future in done:
+				load = running.pop(future)
+				output = future.result()
+				if output is None:
+					continue
+				(out, err, exceeded) = output
+				reason = None
+				# If the latency limit was exceeded while running -> Saturation point has been reached
+				if exceeded:
+					reason = "saturated"
+				elif print_booksim_error_if_applicable(out, err):
+					reason = "failed"
+				# If unstable -> Saturation point has been reached
+				elif "unstable" in out.decode("utf-8"):
+					reason = "saturated"
+				# If stable -> Read results
+				else:
+					results[load] = read_booksim_results(out)
+					# Check if the run failed
+					if "packet_latency" not in results[load]:
+						print("Failed run with load %.3f" % load)
+						del results[load]
+						reason = "failed"
+					# Check if saturation throughput has been reached
+					elif (latency_limit is not None) and (latency_limit < results[load]["packet_latency"]["avg"]):
+						reason = "saturated"
+				# Cancel all runs with higher loads
+				if reason is not None and (stop_load is None or load < stop_load):
+					(stop_load, stop_reason) = (load, reason)
+					for (other_future, other_load) in running.items():
+						if other_load > load:
+							stops[other_load].set()
+	# Only keep the results up to the load where the sweep stopped
+	results = {load : result for (load, result) in results.items() if stop_load is None or load <= stop_load}
+	return (results, stop_load, stop_reason)
+
+# Linear saturation search: Starting at a load of 0.1, the load is increased in steps of 0.1 until the network
+# saturates, then, the search is repeated with a 10x finer granularity below the saturation point until the precision
+# is reached.
+def search_saturation_by_sweep(inputs, run_dir, zero_load_latency, workers):
+	precision = inputs["booksim_config"]["precision"]
+	results = {}
+	(first_load, granularity) = (0.1, 0.1)
+	saturation_load = None
+	while True:
+		# Loads at or above a known saturation point are not simulated again
+		loads = [load for load in get_sweep_loads(first_load, granularity) if saturation_load is None or load < saturation_load - granularity / 2]
+		(level_results, stop_load, stop_reason) = run_booksim_loads(inputs, run_dir, loads, zero_load_latency, workers)
+		results.update(level_results)
+		if stop_reason == "failed":
+			break
+		saturation_load = stop_load if stop_load is not None else saturation_load
+		# Network can support a load of 0.999 -> Terminate
+		if saturation_load is None:
+			break
+		# We already are at the maximum precision -> Terminate
+		if round(granularity, (-int(math.log(precision)))) <= precision:
+			break
+		# We can reduce granularity
+		first_load = (saturation_load - granularity) + (granularity / 10)
+		granularity *= 0.1
+	return results
+
+# Bisection saturation search: The saturation point lies between the highest stable load (initially the zero-load)
+# and the lowest saturated load. The search starts at the estimated saturation load (e.g., from the analytical
+# throughput) and brackets the saturation point by moving away from the estimate in steps that double each time (the
+# first step is 10% of the estimate). Then, the interval is bisected until it is smaller than the precision. With
+# multiple workers, several steps are simulated at once and the interval is split into <workers> + 1 parts.
+def search_saturation_by_bisection(inputs, run_dir, zero_load_latency, workers, saturation_estimate):
+	precision = inputs["booksim_config"]["precision"]
+	results = {}
+	(lower, upper) = (0.001, None)
+	loads = [min(max(saturation_estimate, 0.001 + precision), 0.999)] if saturation_estimate is not None else [0.5]
+	step = loads[0] / 10 if saturation_estimate is not None else 0.25
+	while len(loads) > 0:
+		(step_results, stop_load, stop_reason) = run_booksim_loads(inputs, run_dir, loads, zero_load_latency, workers)
+		results.update(step_results)
+		if stop_reason == "failed":
+			break
+		# Narrow down the interval that contains the saturation point
+		lower = max([lower] + [load for load in loads if stop_load is None or load < stop_load])
+		upper = stop_load if stop_load is not None else upper
+		steps = [step * 2 ** i for i in range(workers)]
+		step *= 2 ** workers
+		# No saturation found yet -> Increase the load
+		if upper is None:
+			loads = sorted(set([min(lower + x, 0.999) for x in steps])) if lower < 0.999 else []
+		# Saturation point found with the required precision -> Terminate
+		elif upper - lower <= precision:
+			loads = []
+		# No stable load found yet -> Decrease the load (or bisect if the step reaches below the zero-load)
+		elif lower == 0.001 and upper - steps[0] > lower:
+			loads = sorted([upper - x for x in steps if upper - x > lower])
+		# Split the interval
+		else:
+			loads = [lower + (upper - lower) * (i + 1) / (workers + 1) for i in range(workers)]
+	return results
+
 # Run a BookSim simulation:
 # This runs the C++ code which needs to be built manually by executing "make" in the "booksim2/src" directory
-def run_booksim_simulation(inputs, intermediates, run_identifier):
+# In traffic mode, the saturation point is searched by a linear sweep of loads ("sweep") or by bisection ("bisection"),
+# as set by the "search" parameter of the BookSim configuration. The bisection starts at the saturation_estimate (an
+# injection rate) if given. The number of concurrent BookSim processes is set by the "workers" parameter.
+def run_booksim_simulation(inputs, intermediates, run_dir, saturation_estimate = None):
 	# Load inputs 
 	required_inputs = ["booksim_config"]
 	hlp.read_required_inputs(inputs, required_inputs)
 	booksim_config = inputs["booksim_config"]
 	# Configuration
 	mode = booksim_config["mode"]
-	precision = booksim_config["precision"]
-	saturation_factor = booksim_config["saturation_factor"]
+	search = booksim_config.get("search", "sweep")
+	workers = booksim_config.get("workers", 1)
 	# Paths
-	exec_path = "booksim2/src/booksim"
-	config_path = "booksim2/src/rc_configs/%s.conf" % run_identifier
+	config_path = os.path.join(run_dir, booksim_file_names["config"])
 	# Prepare the results
 	results = {}
-	# Traffic mode: Iterate through loads
+	# Traffic mode: Search the saturation point
 	if mode == "traffic":
-		load = 0.001
-		granularity = 0.1
-		while True:
-			print("Running BookSim simulation with load %.3f" % load) if inputs["verbose"] else None
-			saturation_reached = False
-			# Export the BookSim configuration file
-			export_booksim_config(inputs, run_identifier, load)
-			# Run BookSim
-			proc = subprocess.Popen([exec_path, config_path], stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-			out = proc.stdout.read()
-			err = proc.stderr.read()
-			if print_booksim_error_if_applicable(out, err):
-				break
-			# If unstable -> Saturation point has been reached
-			if "unstable" in out.decode("utf-8"):
-				saturation_reached = True
-			# If stable -> Read results
+		# The zero-load latency is the reference to detect saturation
+		(results, stop_load, stop_reason) = run_booksim_loads(inputs, run_dir, [0.001], None, 1)
+		if 0.001 in results:
+			zero_load_latency = results[0.001]["packet_latency"]["avg"]
+			if search == "sweep":
+				results.update(search_saturation_by_sweep(inputs, run_dir, zero_load_latency, workers))
+			elif search == "bisection":
+				results.update(search_saturation_by_bisection(inputs, run_dir, zero_load_latency, workers, saturation_estimate))
 			else:
-				# Read result
-				results[load] = read_booksim_results(out)
-				# Check if the run failed
-				if "packet_latency" not in results[load]:
-					print("Failed run with load %.3f" % load)
-					break
-				# Check if saturation throughput has been reached
-				elif (0.001 in results) and ((results[0.001]["packet_latency"]["avg"] * saturation_factor) < results[load]["packet_latency"]["avg"]):
-					saturation_reached = True
-			# If the saturation point has been reached go to finer granularity or abort
-			if saturation_reached:
-				# We already are at the maximum precision -> Terminate
-				if round(granularity, (-int(math.log(precision)))) <= precision:
-					break
-				# We can reduce granularity
-				else:
-					load = (load - granularity) + (granularity / 10)
-					granularity *= 0.1
-			# Saturation point not reached yet
-			elif load < 0.999:
-				load = min((0.0 if load == 0.001 else load) + granularity, 0.999)
-			# Network can support a load of 0.999 -> Terminate
-			else:
-				break
+				print("ERROR: Invalid search \"%s\" in BookSim configuration" % search)
+				sys.exit(1)
 		results = dict(sorted(results.items()))
 	elif mode == "trace":
 		print("Running BookSim simulation with trace") if inputs["verbose"] else None
 		# Export the BookSim configuration file
-		export_booksim_config(inputs, run_identifier, 1.0)
+		export_booksim_config(inputs, run_dir, 1.0)
 		# Run BookSim
-		proc = subprocess.Popen([exec_path, config_path], stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-		out = proc.stdout.read()
-		err = proc.stderr.read()
+		(out, err, exceeded) = run_booksim_process(config_path, threading.Event())
 		print_booksim_error_if_applicable(out, err)
 		results = read_booksim_results(out)
 	else:
 		print("ERROR: Invalid mode \"%s\" in BookSim configuration" % mode)
 	# Get the number of nodes in the topology
-	bs_topo_path = "booksim2/src/rc_topologies/%s.anynet" % run_identifier
+	bs_topo_path = os.path.join(run_dir, booksim_file_names["topology"])
 	n_nodes = 0
 	with open(bs_topo_path, "r") as file:
 		lines = file.readlines()
@@ -0,0 +1,125 @@
+# Import python libraries
+import os
+import sys
+import argparse
+import numpy as np
+
+# Import RapidChiplet files
+import helpers as hlp
+import generate_inputs as igen
+import rapidchiplet as rc
+
+# Designs on which the throughput engines are checked: (topology, scale) pairs. Each design is checked with the
+# splif routing ("default" routing table) and the sptmr routing ("extended" routing table).
+checked_designs = [("mesh", "3x4"), ("torus", "4x4"), ("folded_torus", "3x5"), ("flattened_butterfly", "3x3"), ("hypercube", "4x4"), ("hexamesh", "2")]
+checked_routing_algorithms = ["splif", "sptmr"]
+checked_traffic_patterns = ["random_uniform", "hotspot"]
+
+# Parameters of the generated designs (see experiments/example_experiment.json)
+base_params = {
+	"use_memory" : False,
+	"mode" : "traffic",
+	"units_per_chiplet" : 8,
+	"base_chiplet_area" : 74,
+	"phy_area" : 0.85,
+	"base_chiplet_power" : 20,
+	"phy_power" : 0.125,
+	"fraction_power_bumps" : 0.5,
+	"technology" : "tech_1",
+	"chiplets_can_relay" : True,
+	"internal_latency" : 3,
+	"chiplet_spacing" : 0.15,
+	"n_hotspot" : 2,
+	"p_hotspot" : 0.5,
+	"routing_seed" : 0,
+	"routing_cache_dir" : "none",
+}
+
+# Reference: Walk the path of each flow through the array of next hops, one hop at a time, and add the traffic of the
+# flow to each link on the path
+def compute_link_loads_by_walk(inputs, intermediates):
+	# Compute intermediates if not already computed
+	required_intermediates = ["node_index", "next_hops"]
+	hlp.compute_required_intermediates(inputs, intermediates, required_intermediates)
+	node_index = intermediates["node_index"]
+	next_hops_ = intermediates["next_hops"]
+	next_hops = next_hops_["next_hops"]
+	(adj_offsets, adj_nodes) = (node_index["adj_offsets"].tolist(), node_index["adj_nodes"].tolist())
+	link_loads = np.zeros(len(node_index["links"]))
+	for ((sid, did), load) in inputs["traffic_by_chiplet"].items():
+		# Chiplet c has node id c, packets are injected through port 0
+		(cur, port) = (sid, 0)
+		# A path can not contain more hops than there are states (node, input port) in the routing table
+		for n_hops in range(next_hops[:, 0].size + 1):
+			if cur == did:
+				break
+			nxt = int(next_hops[cur, did] if next_hops_["type"] == "default" else next_hops[cur, did, port])
+			link_loads[node_index["link_ids"][(node_index["nodes"][cur], node_index["nodes"][nxt])]] += load
+			# The packet enters the next node through the port of the link from the current node
+			port = adj_nodes[adj_offsets[nxt]:adj_offsets[nxt + 1]].index(cur) + 1
+			cur = nxt
+		else:
+			print("ERROR: The routing table contains a loop on the path from chiplet %d to chiplet %d" % (sid, did))
+			sys.exit(1)
+	# Return results
+	return link_loads
+
+# Compute the link loads and the aggregate throughput of a design with the given throughput engine ("walk" is the
+# reference). A fresh set of intermediates is used, such that no link loads are shared between the engines.
+def evaluate_throughput_engine(design_inputs, throughput_engine):
+	inputs = dict(design_inputs, throughput_engine = throughput_engine)
+	intermediates = {}
+	if throughput_engine == "walk":
+		intermediates["link_loads"] = compute_link_loads_by_walk(inputs, intermediates)
+	throughput = rc.compute_throughput(inputs, intermediates)
+	return (intermediates["link_loads"], throughput["aggregate_throughput"])
+
+# Generate a design (without writing any files) and check that the "matrix" and "tree" throughput engines compute
+# the same link loads and aggregate throughput as the reference walk. Returns the number of mismatches.
+def check_design(params, design_name):
+	files = igen.generate_inputs(params, design_name, do_write = False)
+	# The generated inputs are not written, hence, they are passed directly. Only technologies and packaging are read.
+	design_inputs = {"verbose" : False, "validate" : False}
+	for input_name in ["design", "chiplets", "placement", "topology", "routing_table", "traffic_by_chiplet"]:
+		design_inputs[input_name] = files[input_name]
+	(walk_loads, walk_throughput) = evaluate_throughput_engine(design_inputs, "walk")
+	errors = 0
+	for throughput_engine in ["matrix", "tree"]:
+		(loads, throughput) = evaluate_throughput_engine(design_inputs, throughput_engine)
+		matches = np.allclose(loads, walk_loads) and np.isclose(throughput, walk_throughput)
+		status = "OK" if matches else "MISMATCH"
+		print("%s: %s = %.6f, walk = %.6f [%s]" % (design_name, throughput_engine, throughput, walk_throughput, status))
+		errors += 0 if matches else 1
+	return errors
+
+if __name__ == "__main__":
+	# Read command line arguments
+	parser = argparse.ArgumentParser()
+	parser.add_argument("-tf", "--technologies_file", default = "inputs/technologies/example_technologies.json", help = "Path to the \"technologies\" input file")
+	parser.add_argument("-pf", "--packaging_file", default = "inputs/packagings/example_packaging.json", help = "Path to the \"packaging\" input file")
+	parser.add_argument("-bcf", "--booksim_config_file", default = "inputs/booksim_configs/example_booksim_config.json", help = "Path to the \"booksim_config\" input file")
+	args = parser.parse_args()
+	# The technologies, packaging, and BookSim configuration are not generated
+	for file in [args.technologies_file, args.packaging_file, args.booksim_config_file]:
+		if not os.path.isfile(file):
+			print("ERROR: The input file %s does not exist" % file)
+			sys.exit(1)
+	params = dict(base_params, technologies_file = args.technologies_file, packaging_file = args.packaging_file, booksim_config_file = args.booksim_config_file)
+	# Compare the throughput engines with the reference walk on all designs
+	n_designs = 0
+	errors = 0
+	for (topology, scale) in checked_designs:
+		scale_param = "hex_scale" if igen.tgen.topology_to_placement[topology] == "hexagonal" else "grid_scale"
+		for routing_algorithm in checked_routing_algorithms:
+			for traffic_pattern in checked_traffic_patterns:
+				design_params = dict(params, topology = topology, routing_algorithm = routing_algorithm, traffic_pattern = traffic_pattern)
+				design_params[scale_param] = scale
+				errors += check_design(design_params, "check_%s_%s_%s_%s" % (topology, scale, routing_algorithm, traffic_pattern))
+				n_designs += 1
+	if n_designs == 0:
+		print("ERROR: No designs were checked")
+		sys.exit(1)
+	if errors > 0:
+		print("ERROR: The throughput engines disagree with the reference walk in %d cases" % errors)
+		sys.exit(1)
+	print("The throughput engines agree with the reference walk on all %d designs" % n_designs)
@@ -9,6 +9,7 @@ import generate_chiplet as cgen
 import generate_placement as pgen
 import generate_topology as tgen
 import generate_routing as rgen
+import algorithmic_routing as ar
 import generate_traffic as trgen 
 import inputs.trace_to_traffic as t2t
 
@@ -114,10 +115,29 @@ def generate_inputs(params, design_name, do_write = True):
 	# Routing table
 	routing_algo = params["routing_algorithm"]
 	routing_file = "routing_table_%s" % design_name
-	routing_table = rgen.generate_routing(chiplets, placement, topology, routing_algo)
-	hlp.write_json("inputs/routing_tables/%s.json" % routing_file, routing_table) if do_write else None
+	# Routing tables are cached, by default also on disk. Set "routing_cache_dir" to "none" to only cache in memory.
+	routing_cache_dir = params.get("routing_cache_dir", rgen.routing_cache_dir)
+	routing_cache_dir = routing_cache_dir if routing_cache_dir != "none" else None
+	if routing_algo == "dor":
+		# Dimension-order routing is computed on demand, only its parameters are stored (see algorithmic_routing.py)
+		routing_table = ar.generate_algorithmic_routing(topology_name, params.get("rows", 0), params.get("cols", 0))
+	else:
+		routing_table = rgen.generate_routing_cached(chiplets, placement, topology, routing_algo, params.get("routing_workers", 1), params.get("routing_seed", None), routing_cache_dir)
+	# Optionally, "extended" routing tables are compressed (the cached routing table is not modified)
+	if params.get("compress_routing_table", False) and routing_table["type"] == "extended":
+		routing_table = hlp.compress_routing_table(routing_table)
+	# The routing table is written as JSON (default) or as an array of next hops ("routing_table_format" : "npy")
+	routing_format = params.get("routing_table_format", "json") if routing_table["type"] != "algorithmic" else "json"
+	if routing_format == "npy":
+		node_index = hlp.construct_node_index(chiplets, placement, topology)
+		hlp.write_routing_table_array("inputs/routing_tables/%s.npy" % routing_file, routing_table, node_index) if do_write else None
+	elif routing_format == "json":
+		hlp.write_json("inputs/routing_tables/%s.json" % routing_file, routing_table) if do_write else None
+	else:
+		print("ERROR: Unknown routing table format: %s" % routing_format)
+		sys.exit(1)
 	files["routing_table"] = routing_table
-	design["routing_table"] = "inputs/routing_tables/%s.json" % routing_file 
+	design["routing_table"] = "inputs/routing_tables/%s.%s" % (routing_file, routing_format)
 	# Traffic and Trace
 	if params["mode"] == "traffic":
 		traffic_pattern = params["traffic_pattern"]
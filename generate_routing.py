@@ -3,66 +3,91 @@ import networkx as nx
 import itertools as it
 import argparse
 import random
-import queue
 import sys
+import os
+import json
+import hashlib
+import collections
+import concurrent.futures
+import numpy as np
 
 # Import RapidChiplet files
 import helpers as hlp
 import routing_utils as utils
+import algorithmic_routing as ar
 
 #########################################################################################################
 # Routing algorithms
 #########################################################################################################
 
+# Shortest-path-lowest-id-first routing tree towards one destination, computed by a breadth-first search on a graph
+# with integer node ids where chiplets have lower ids than interposer-routers (see hlp.construct_node_index).
+# The tie-breaking is the same as in shortest_path_lowest_id_first_routing: Among all next hops on a shortest path,
+# interposer-routers are preferred over chiplets and lower ids are preferred over higher ids. Only nodes that can
+# relay traffic and the destination itself forward traffic. adj_list[n] contains the neighbors of node n.
+# Returns the distance and next hop (-1 if there is none) of each node, and the nodes in the order of discovery.
+def shortest_path_lowest_id_first_tree(adj_list, relay, n_chiplets, dst):
+	dists = [-1] * len(adj_list)
+	nexts = [-1] * len(adj_list)
+	dists[dst] = 0
+	order = [dst]
+	head = 0
+	while head < len(order):
+		cur_node = order[head]
+		head += 1
+		# Nodes that can not relay traffic are reached but not explored
+		if cur_node != dst and not relay[cur_node]:
+			continue
+		cur_is_irouter = cur_node >= n_chiplets
+		nei_dist = dists[cur_node] + 1
+		for nei_node in adj_list[cur_node]:
+			if dists[nei_node] < 0:
+				dists[nei_node] = nei_dist
+				nexts[nei_node] = cur_node
+				order.append(nei_node)
+			# An equally long path but over an interposer-router or over a node of the same type with a lower id
+			elif dists[nei_node] == nei_dist:
+				nxt_is_irouter = nexts[nei_node] >= n_chiplets
+				if (cur_is_irouter and not nxt_is_irouter) or (cur_is_irouter == nxt_is_irouter and cur_node < nexts[nei_node]):
+					nexts[nei_node] = cur_node
+	return (dists, nexts, order)
+
 # The fact that we always use the shortest path with the lowest next-hop-id results in deterministic,
 # deadlock-free routing. However, the path diversity is not exploited, and congestion may occur.
 # Consider all chiplets as lower-id than all interposer-routers.
-def shortest_path_lowest_id_first_routing(ici_graph):	
+# All links have the same weight, hence, we use one breadth-first search per destination on integer node ids.
+def shortest_path_lowest_id_first_routing(ici_graph, workers = 1):	
 	# Input: ICI graph
 	nodes = ici_graph["nodes"]
 	relay_map = ici_graph["relay_map"]
 	adj_list = ici_graph["adj_list"]
 	chiplets = [x for x in nodes if x[0] == "chiplet"]
+	# Integer node ids: Chiplets come first in the list of nodes, hence, they have lower ids than interposer-routers
+	node_ids = {node : nid for (nid, node) in enumerate(nodes)}
+	relay = [relay_map[node] for node in nodes]
+	# Adjacency in CSR format: The neighbors of node n are adj_nodes[adj_offsets[n]:adj_offsets[n+1]]
+	adj_offsets = [0]
+	adj_nodes = []
+	for node in nodes:
+		adj_nodes += [node_ids[nei_node] for nei_node in adj_list[node]]
+		adj_offsets.append(len(adj_nodes))
+	arrays = {"offsets" : np.array(adj_offsets, dtype = np.int64), "targets" : np.array(adj_nodes, dtype = np.int64), "relay" : np.array(relay, dtype = bool)}
 	# Output: One routing table for each node. Only chiplets are possible destinations.
 	routing_table = {node : {dst : None for dst in chiplets} for node in nodes}
-	# Run Dijkstra's algorithm. Only use chiplets as possible destinations.
-	for dst in chiplets:
-		dists = {node : float("inf") for node in nodes}
-		nexts = {node : None for node in nodes}
-		todo = queue.PriorityQueue()	
-		# Start from the destination
-		dists[dst] = 0
-		todo.put((0, dst))
-		# Explore the graph
-		while not todo.empty():
-			(cur_dist, cur_node) = todo.get()
-			# Skip if we have already found a shorter path to the current node
-			if cur_dist > dists[cur_node]:
-				continue
-			# Iterate over neighbors of the current node
-			for nei_node in adj_list[cur_node]:
-				nei_dist = cur_dist + 1
-				# If we found a shorter path from the neighbor to the destination
-				# or an equally long path but over an interposer-router
-				# or a path of equal length and component-type but with a lower id
-				if (nei_dist < dists[nei_node]) or ((nei_dist == dists[nei_node]) and 
-				   (((nexts[nei_node][0] == "chiplet") and (cur_node[0] == "irouter")) or
-				   ((nexts[nei_node][0] == cur_node[0]) and (nexts[nei_node][1] > cur_node[1])))):
-					dists[nei_node] = nei_dist
-					nexts[nei_node] = cur_node
-					# If the neighbor node can relay traffic, add it to the queue
-					if relay_map[nei_node]:
-						todo.put((nei_dist, nei_node))
+	# The routing trees of all destinations are independent, they can be computed by multiple workers
+	trees = run_in_chunks(compute_splif_trees, arrays, {"n_chiplets" : len(chiplets)}, [node_ids[dst] for dst in chiplets], workers)
+	for (dst, nexts) in zip(chiplets, trees):
+		nexts = nexts.tolist()
 		# Verify that all nodes have a valid path to the destination and construct the routing table
-		for node in nodes:
+		for (nid, node) in enumerate(nodes):
 			if node != dst:
-				if nexts[node] is None:
+				if nexts[nid] < 0:
 					print("ERROR: Unable to find a path from node %s to node %s" % (str(node), str(dst)))
 				else:
-					routing_table[node][dst] = nexts[node]
+					routing_table[node][dst] = nodes[nexts[nid]]
 	return {"type" : "default", "table" : routing_table}
 
-def shortest_path_turn_model_random(ici_graph):
+def shortest_path_turn_model_random(ici_graph, workers = 1, rng = random):
 	# Create a directed graph for the shortest path computations
 	G = nx.DiGraph()
 	#also create undirected graph containing only the vertices with forwarding capacity to compute the forbidden turns set on.
@@ -110,6 +135,8 @@ def shortest_path_turn_model_random(ici_graph):
 	#compute the cycle breaking set for G_SCB
 	forbidden_turns = []
 	utils.simple_cycle_breaking(G_SCB, forbidden_turns)
+	forbidden_turns = set(forbidden_turns)
+	non_forwarding = set(non_forwarding)
 	#generate the linegraph 
 	LG =utils.generate_line_graph(G)
 
@@ -121,40 +148,46 @@ def shortest_path_turn_model_random(ici_graph):
 
 	LG.remove_edges_from(to_remove)
 
-	#now compute shortest paths from to all chiplets
-	pred_map= {}
-	utils.get_shortest_valid_paths(LG, chiplets, src, pred_map)
+	#integer ids for the nodes of the linegraph, successors are kept in the order of LG, such that the breadth-first
+	#searches discover the nodes in the same order as nx.predecessor
+	lg_nodes = list(LG.nodes())
+	lg_ids = {e : i for (i, e) in enumerate(lg_nodes)}
+	lg_succ = [[lg_ids[e2] for e2 in LG.succ[e1]] for e1 in lg_nodes]
+	lg_offsets = np.cumsum([0] + [len(x) for x in lg_succ], dtype = np.int64)
+	lg_targets = np.array([e2 for x in lg_succ for e2 in x], dtype = np.int64)
+	lg_pred = [[lg_ids[e1] for e1 in LG.pred[e2]] for e2 in lg_nodes]
 
 	#now compute the routing table
 
-	#just so the neighbors are correct again
-	G.remove_node(src)
-	G.remove_node(sink)
-
 	#routing table format is: routing_table[source][destination][previous] -> next_hop
 	# notably:
 	#   - no routing table entry to route from node i to node i.
-	#   - when packets are injected into the network, they have prev = -1 
+	#   - when packets are injected into the network, they have prev = "-1" 
 	routing_table = {node : {dst : {} for dst in [c for c in chiplets if c != node]} for node in nodes}
 
-	for u in chiplets:
+	#the shortest paths from all sources are independent, they can be computed by multiple workers. the random
+	#choices are made in this process, in the order of the sources.
+	sources = [lg_ids[(src,u)] for u in chiplets]
+	distances = run_in_chunks(compute_line_graph_distances, {"offsets" : lg_offsets, "targets" : lg_targets}, {}, sources, workers)
+	for (u, (dists, ranks)) in zip(chiplets, distances):
+		(dists, ranks) = (dists.tolist(), ranks.tolist())
 		for v in chiplets:
 			# first clause covers the case, when there is no path from u to v in the network (as then we have no RT entry)
-			if u == v or (v,sink) not in pred_map[u].keys():
+			if u == v or dists[lg_ids[(v,sink)]] < 0:
 				pass
-			# if there is a path, we use the pred_map as a reverse_pred map and set the next hops until we arrive at u or 
+			# if there is a path, we walk the shortest paths backwards and set the next hops until we arrive at u or 
 			# until we find an entry in the routing table for the rest of the path.
 			else:
 				goal = (src,u)
-				curr = (v,sink)
+				curr = lg_ids[(v,sink)]
 				# wait until we reach u
-				while curr[0] != goal[1]:
-					next = random.choice(pred_map[u][curr])
-					first = curr[1]
-					second = curr[0]
-					third = next[0]
+				while lg_nodes[curr][0] != goal[1]:
+					next = rng.choice(utils.get_shortest_path_predecessors(lg_pred, dists, ranks, curr))
+					first = lg_nodes[curr][1]
+					second = lg_nodes[curr][0]
+					third = lg_nodes[next][0]
 					if first ==sink:
-						routing_table[second][u][-1] = third
+						routing_table[second][u]["-1"] = third
 					else:
 						if first not in routing_table[second][u].keys():
 							routing_table[second][u][first] = third
@@ -164,17 +197,253 @@ def shortest_path_turn_model_random(ici_graph):
 					curr = next
 	return {"type" : "extended", "table" : routing_table}
 
-def generate_routing(chiplets, placement, topology, routing_algorithm):
-	# Construct ICI graph
+# Order of the nodes for up*/down* routing: Nodes are sorted by their depth in a breadth-first search tree rooted at
+# the relaying node with the highest degree (ties: lower id), nodes at the same depth are sorted by id. Only nodes
+# that can relay traffic are explored. Returns the nodes in this order and the rank of each node in the order.
+def up_down_order(adj_list, relay):
+	n_nodes = len(adj_list)
+	candidates = [nid for nid in range(n_nodes) if relay[nid]]
+	root = max(candidates if len(candidates) > 0 else range(n_nodes), key = lambda nid: (len(adj_list[nid]), -nid))
+	depths = [-1] * n_nodes
+	depths[root] = 0
+	queue = [root]
+	head = 0
+	while head < len(queue):
+		cur_node = queue[head]
+		head += 1
+		if cur_node != root and not relay[cur_node]:
+			continue
+		for nei_node in adj_list[cur_node]:
+			if depths[nei_node] < 0:
+				depths[nei_node] = depths[cur_node] + 1
+				queue.append(nei_node)
+	# Unreachable nodes come last
+	order = sorted(range(n_nodes), key = lambda nid: (depths[nid] if depths[nid] >= 0 else n_nodes, nid))
+	ranks = [0] * n_nodes
+	for (rank, nid) in enumerate(order):
+		ranks[nid] = rank
+	return (order, ranks)
+
+# Up*/down* routing tree towards one destination. A link is an up-link if it leads to a node with a lower rank (see
+# up_down_order) and a down-link otherwise. On each route, all up-links come before all down-links. A node that can
+# reach the destination using down-links only takes the shortest such route, otherwise it takes the up-link to the
+# node with the shortest remaining route. Nodes that can not relay traffic only send their own traffic, they take
+# the shortest route that is allowed at the start of a route. Returns the next hop (-1 if there is none) of each node.
+def up_down_tree(adj_list, relay, order, ranks, dst):
+	n_nodes = len(adj_list)
+	forwards = [relay[nid] or nid == dst for nid in range(n_nodes)]
+	# Length of the shortest route using only down-links (the down-neighbors of a node come later in the order)
+	down_dists = [-1] * n_nodes
+	down_nexts = [-1] * n_nodes
+	down_dists[dst] = 0
+	for cur_node in reversed(order):
+		if cur_node == dst or not forwards[cur_node]:
+			continue
+		for nei_node in adj_list[cur_node]:
+			if ranks[nei_node] > ranks[cur_node] and down_dists[nei_node] >= 0 and forwards[nei_node]:
+				if down_nexts[cur_node] < 0 or down_dists[nei_node] < down_dists[down_nexts[cur_node]]:
+					down_nexts[cur_node] = nei_node
+		if down_nexts[cur_node] >= 0:
+			down_dists[cur_node] = down_dists[down_nexts[cur_node]] + 1
+	# Length of the route that is taken (the up-neighbors of a node come earlier in the order)
+	dists = [-1] * n_nodes
+	nexts = [-1] * n_nodes
+	dists[dst] = 0
+	for cur_node in order:
+		if cur_node == dst or not forwards[cur_node]:
+			continue
+		if down_nexts[cur_node] >= 0:
+			(dists[cur_node], nexts[cur_node]) = (down_dists[cur_node], down_nexts[cur_node])
+			continue
+		for nei_node in adj_list[cur_node]:
+			if ranks[nei_node] < ranks[cur_node] and dists[nei_node] >= 0 and forwards[nei_node]:
+				if nexts[cur_node] < 0 or dists[nei_node] < dists[nexts[cur_node]]:
+					nexts[cur_node] = nei_node
+		if nexts[cur_node] >= 0:
+			dists[cur_node] = dists[nexts[cur_node]] + 1
+	# Nodes that do not relay traffic can start their route with an up-link or a down-link
+	for cur_node in range(n_nodes):
+		if forwards[cur_node]:
+			continue
+		best_dist = -1
+		for nei_node in adj_list[cur_node]:
+			nei_dist = down_dists[nei_node] if ranks[nei_node] > ranks[cur_node] else dists[nei_node]
+			if forwards[nei_node] and nei_dist >= 0 and (best_dist < 0 or nei_dist < best_dist):
+				(best_dist, nexts[cur_node]) = (nei_dist, nei_node)
+	return nexts
+
+# Up*/down* routing: Every route consists of zero or more up-links followed by zero or more down-links, hence, the
+# channel dependency graph is acyclic and the routing is deadlock-free. The node order is computed once, and each
+# routing tree takes time linear in the number of links. The routing table is destination-based ("default").
+def up_down_routing(ici_graph, workers = 1):
+	# Input: ICI graph
+	nodes = ici_graph["nodes"]
+	relay_map = ici_graph["relay_map"]
+	adj_list = ici_graph["adj_list"]
+	chiplets = [x for x in nodes if x[0] == "chiplet"]
+	# Integer node ids and adjacency in CSR format (see shortest_path_lowest_id_first_routing)
+	node_ids = {node : nid for (nid, node) in enumerate(nodes)}
+	relay = [relay_map[node] for node in nodes]
+	adj_offsets = [0]
+	adj_nodes = []
+	for node in nodes:
+		adj_nodes += [node_ids[nei_node] for nei_node in adj_list[node]]
+		adj_offsets.append(len(adj_nodes))
+	(order, ranks) = up_down_order([adj_nodes[adj_offsets[nid]:adj_offsets[nid+1]] for nid in range(len(nodes))], relay)
+	arrays = {"offsets" : np.array(adj_offsets, dtype = np.int64), "targets" : np.array(adj_nodes, dtype = np.int64), "relay" : np.array(relay, dtype = bool), "order" : np.array(order, dtype = np.int64), "ranks" : np.array(ranks, dtype = np.int64)}
+	# Output: One routing table for each node. Only chiplets are possible destinations.
+	routing_table = {node : {dst : None for dst in chiplets} for node in nodes}
+	trees = run_in_chunks(compute_up_down_trees, arrays, {}, [node_ids[dst] for dst in chiplets], workers)
+	for (dst, nexts) in zip(chiplets, trees):
+		nexts = nexts.tolist()
+		# Verify that all nodes have a valid path to the destination and construct the routing table
+		for (nid, node) in enumerate(nodes):
+			if node != dst:
+				if nexts[nid] < 0:
+					print("ERROR: Unable to find a path from node %s to node %s" % (str(node), str(dst)))
+				else:
+					routing_table[node][dst] = nodes[nexts[nid]]
+	return {"type" : "default", "table" : routing_table}
+
+#########################################################################################################
+# Parallel execution
+#########################################################################################################
+
+# Read-only graph of a worker process, it is read from shared memory once when the worker starts
+worker_graph = {}
+
+# Convert CSR arrays (offsets, targets) to adjacency lists, all other arrays and scalars are kept as they are
+def prepare_graph(arrays, scalars):
+	graph = dict(scalars)
+	graph.update(arrays)
+	(offsets, targets) = (graph.pop("offsets"), graph.pop("targets"))
+	graph["adj_list"] = [targets[offsets[i]:offsets[i+1]] for i in range(len(offsets) - 1)]
+	return graph
+
+def init_worker(descriptors, scalars):
+	worker_graph.update(prepare_graph(hlp.read_shared_arrays(descriptors), scalars))
+
+def run_worker_task(task, items):
+	return task(worker_graph, items)
+
+# Run task(graph, items) for all items and yield the results in the order of the items. With multiple workers, the items
+# are split into chunks that are processed by a pool of processes, which read the graph from shared memory.
+def run_in_chunks(task, arrays, scalars, items, workers):
+	if workers <= 1:
+		graph = prepare_graph({name : array.tolist() for (name, array) in arrays.items()}, scalars)
+		for item in items:
+			yield task(graph, [item])[0]
+		return
+	(blocks, descriptors) = hlp.create_shared_arrays(arrays)
+	try:
+		n_chunks = min(len(items), 4 * workers)
+		chunks = [items[(i * len(items)) // n_chunks:((i + 1) * len(items)) // n_chunks] for i in range(n_chunks)]
+		with concurrent.futures.ProcessPoolExecutor(max_workers = workers, initializer = init_worker, initargs = (descriptors, scalars)) as executor:
+			for results in executor.map(run_worker_task, [task] * n_chunks, chunks):
+				yield from results
+	finally:
+		for block in blocks:
+			block.close()
+			block.unlink()
+
+# Next hops of the shortest-path-lowest-id-first routing trees towards the given destinations
+def compute_splif_trees(graph, dsts):
+	return [np.array(shortest_path_lowest_id_first_tree(graph["adj_list"], graph["relay"], graph["n_chiplets"], dst)[1], dtype = np.int64) for dst in dsts]
+
+# Next hops of the up*/down* routing trees towards the given destinations
+def compute_up_down_trees(graph, dsts):
+	return [np.array(up_down_tree(graph["adj_list"], graph["relay"], graph["order"], graph["ranks"], dst), dtype = np.int64) for dst in dsts]
+
+# Distances and discovery order of breadth-first searches from the given sources
+def compute_line_graph_distances(graph, sources):
+	return [tuple(np.array(x, dtype = np.int64) for x in utils.get_shortest_path_distances(graph["adj_list"], source)) for source in sources]
+
+#########################################################################################################
+# Routing cache
+#########################################################################################################
+
+# Directory of the on-disk routing cache and bounds on the size of the in-memory and on-disk caches
+routing_cache_dir = "./inputs/routing_cache"
+# Reading a splif routing table from a JSON file takes longer than computing it, hence, it is only cached in memory
+disk_cached_routing_algorithms = ["sptmr"]
+routing_cache_max_entries = 16
+routing_cache_max_bytes = 2 ** 30
+
+# In-memory routing cache, ordered from least to most recently used
+routing_cache = collections.OrderedDict()
+
+# The routing only depends on the ICI graph (nodes, relay flags, and links), the routing algorithm, and for sptmr, on
+# the seed of the random number generator. The cache key is a hash of a canonical representation of these inputs.
+def get_routing_cache_key(ici_graph, routing_algorithm, seed):
+	nodes = ici_graph["nodes"]
+	node_ids = {node : nid for (nid, node) in enumerate(nodes)}
+	links = sorted([(node_ids[node], node_ids[nei]) for node in nodes for nei in ici_graph["adj_list"][node] if node_ids[node] < node_ids[nei]])
+	key = {
+		"nodes" : [list(node) for node in nodes],
+		"relay" : [ici_graph["relay_map"][node] for node in nodes],
+		"links" : links,
+		"routing_algorithm" : routing_algorithm,
+		"seed" : seed if routing_algorithm == "sptmr" else None,
+	}
+	return hashlib.sha256(json.dumps(key, separators = (",", ":")).encode()).hexdigest()
+
+# Same as generate_routing, but routing tables are cached in memory and (unless cache_dir is None) on disk. The routing
+# of sptmr is only cached if a seed is given. Cached routing tables are shared and must not be modified by the caller.
+def generate_routing_cached(chiplets, placement, topology, routing_algorithm, workers = 1, seed = None, cache_dir = routing_cache_dir):
 	ici_graph = hlp.construct_ici_graph(chiplets, placement, topology)
-	# Construct routing table
+	if routing_algorithm == "sptmr" and seed is None:
+		return route_ici_graph(ici_graph, routing_algorithm, workers, seed)
+	key = get_routing_cache_key(ici_graph, routing_algorithm, seed)
+	# In-memory cache
+	if key in routing_cache:
+		routing_cache.move_to_end(key)
+		return routing_cache[key]
+	# On-disk cache, the modification time of a file is its last use
+	use_disk = cache_dir is not None and routing_algorithm in disk_cached_routing_algorithms
+	cache_file = os.path.join(cache_dir, key + ".json") if use_disk else None
+	routing_table = None
+	if cache_file is not None:
+		# The cached file can be evicted by a concurrent run at any time
+		try:
+			routing_table = hlp.read_json(cache_file)
+			os.utime(cache_file)
+		except FileNotFoundError:
+			pass
+	if routing_table is None:
+		routing_table = route_ici_graph(ici_graph, routing_algorithm, workers, seed)
+		if cache_file is not None:
+			# Write to a temporary file first, such that concurrent runs never read a partially written file
+			os.makedirs(cache_dir, exist_ok = True)
+			hlp.write_json(cache_file + ".%d.tmp" % os.getpid(), routing_table)
+			os.replace(cache_file + ".%d.tmp" % os.getpid(), cache_file)
+			hlp.evict_cache_files(cache_dir, routing_cache_max_bytes)
+	routing_cache[key] = routing_table
+	if len(routing_cache) > routing_cache_max_entries:
+		routing_cache.popitem(last = False)
+	return routing_table
+
+#########################################################################################################
+# Routing generation
+#########################################################################################################
+
+def route_ici_graph(ici_graph, routing_algorithm, workers = 1, seed = None):
 	if routing_algorithm == "splif":
-		routing_table = shortest_path_lowest_id_first_routing(ici_graph)
+		routing_table = shortest_path_lowest_id_first_routing(ici_graph, workers)
 	elif routing_algorithm == "sptmr":
-		routing_table = shortest_path_turn_model_random(ici_graph)
+		rng = random.Random(seed) if seed is not None else random
+		routing_table = shortest_path_turn_model_random(ici_graph, workers, rng)
+	elif routing_algorithm == "updown":
+		routing_table = up_down_routing(ici_graph, workers)
 	else:
 		print("ERROR: Unknown routing algorithm: %s" % routing_algorithm)
 		sys.exit(1)
+	return routing_table
+
+def generate_routing(chiplets, placement, topology, routing_algorithm, workers = 1, seed = None):
+	# Construct ICI graph
+	ici_graph = hlp.construct_ici_graph(chiplets, placement, topology)
+	# Construct routing table
+	routing_table = route_ici_graph(ici_graph, routing_algorithm, workers, seed)
 	# Store results
 	return routing_table
 
@@ -183,7 +452,13 @@ if __name__ == "__main__":
 	parser = argparse.ArgumentParser()
 	parser.add_argument("-df", "--design_file", required = True, help = "Path to the \"design\" input file")
 	parser.add_argument("-rtf", "--routing_table_file", required = True, help = "Name of the routing table file (is stored in ./inputs/routing_tables)")
-	parser.add_argument("-ra", "--routing_algorithm", required = True, help = "Routing algorithm to use. Options: splif")
+	parser.add_argument("-ra", "--routing_algorithm", required = True, help = "Routing algorithm to use. Options: splif, sptmr, updown, dor")
+	parser.add_argument("-tn", "--topology_name", required = False, help = "Topology of the design (dor only). Options: %s" % ", ".join(ar.algorithmic_routing_functions))
+	parser.add_argument("-gs", "--grid_scale", required = False, help = "Scale of the grid-placement in the format <rows>x<cols> (dor only)")
+	parser.add_argument("-w", "--workers", type = int, default = 1, help = "Number of processes used to compute the routing")
+	parser.add_argument("-f", "--format", default = "json", choices = ["json","npy"], help = "File format of the routing table")
+	parser.add_argument("-c", "--compress", action = "store_true", help = "Compress \"extended\" routing tables (default next hop and exceptions)")
+	parser.add_argument("-s", "--seed", type = int, default = None, help = "Seed of the random number generator (sptmr only)")
 	args = parser.parse_args()
 	# Read input files
 	design = hlp.read_json(filename = args.design_file)
@@ -191,7 +466,20 @@ if __name__ == "__main__":
 	placement = hlp.read_json(filename = design["placement"])
 	topology = hlp.read_json(filename = design["topology"])
 	# Generate routing table
-	routing_table = generate_routing(chiplets, placement, topology, args.routing_algorithm)
+	if args.routing_algorithm == "dor":
+		if args.topology_name is None or args.grid_scale is None:
+			print("ERROR: The routing algorithm dor requires the arguments -tn and -gs")
+			sys.exit(1)
+		(rows, cols) = [int(x) for x in args.grid_scale.split("x")]
+		routing_table = ar.generate_algorithmic_routing(args.topology_name, rows, cols)
+	else:
+		routing_table = generate_routing(chiplets, placement, topology, args.routing_algorithm, args.workers, args.seed)
+	if args.compress and routing_table["type"] == "extended":
+		routing_table = hlp.compress_routing_table(routing_table)
 	# Write routing
-	hlp.write_json("./inputs/routing_tables/%s.json" % args.routing_table_file, routing_table)
+	if args.format == "npy" and routing_table["type"] != "algorithmic":
+		node_index = hlp.construct_node_index(chiplets, placement, topology)
+		hlp.write_routing_table_array("./inputs/routing_tables/%s.npy" % args.routing_table_file, routing_table, node_index)
+	else:
+		hlp.write_json("./inputs/routing_tables/%s.json" % args.routing_table_file, routing_table)
 
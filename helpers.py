@@ -1,7 +1,13 @@
 # Python libraries
+import os
+import sys
 import json
 import copy
 import math
+import threading
+import collections.abc
+import numpy as np
+from multiprocessing import shared_memory
 
 # RapidChiplet libraries
 import rapidchiplet as rc
@@ -63,13 +69,23 @@ def read_json(filename):
     file.close()
     return file_content
 
+# Inputs are read and validated by one thread at a time (validating an input can read further inputs)
+input_lock = threading.RLock()
+
 # Read inputs if they are not already present
 def read_required_inputs(inputs, required_inputs):
 	design = inputs["design"]
 	for input_name in required_inputs:
 		if input_name not in inputs:
-			inputs[input_name] = read_json(design[input_name])
-			val.validation_functions[input_name](inputs)
+			with input_lock:
+				if input_name not in inputs:
+					if input_name == "routing_table" and design[input_name].endswith(".npy"):
+						read_required_inputs(inputs, ["chiplets","placement","topology"])
+						node_index = construct_node_index(inputs["chiplets"], inputs["placement"], inputs["topology"])
+						inputs[input_name] = read_routing_table_array(design[input_name], node_index)
+					else:
+						inputs[input_name] = read_json(design[input_name])
+					val.validation_functions[input_name](inputs)
 
 # Compute intermediates if they are not already present
 def compute_required_intermediates(inputs, intermediates, required_intermediates):
@@ -77,6 +93,92 @@ def compute_required_intermediates(inputs, intermediates, required_intermediates
 		if intermediate_name not in intermediates:
 			intermediates[intermediate_name] = rc.metric_computation_functions[intermediate_name](inputs, intermediates)
 
+# Remove the least recently used files (by modification time) from an on-disk cache until it fits into the given number
+# of bytes. Temporary files of cache entries that are being written (".tmp") are ignored. Files that are evicted by a
+# concurrent run in the meantime are skipped.
+def evict_cache_files(cache_dir, max_bytes):
+	files = []
+	with os.scandir(cache_dir) as entries:
+		for entry in entries:
+			if entry.name.endswith(".tmp"):
+				continue
+			try:
+				stat = entry.stat()
+			except FileNotFoundError:
+				continue
+			files.append((stat.st_mtime, stat.st_size, entry.path))
+	files.sort()
+	total_bytes = sum([size for (mtime, size, file) in files])
+	for (mtime, size, file) in files:
+		if total_bytes <= max_bytes:
+			break
+		# A file that is already gone no longer counts towards the size of the cache either
+		try:
+			os.remove(file)
+		except FileNotFoundError:
+			pass
+		total_bytes -= size
+
+# Copy numpy arrays into shared memory blocks, such that worker processes can read them without pickling.
+# Returns the shared memory blocks (to be closed and unlinked by the caller) and descriptors to attach to them.
+def create_shared_arrays(arrays):
+	blocks = []
+	descriptors = {}
+	for (name, array) in arrays.items():
+		block = shared_memory.SharedMemory(create = True, size = max(array.nbytes, 1))
+		np.ndarray(array.shape, dtype = array.dtype, buffer = block.buf)[...] = array
+		blocks.append(block)
+		descriptors[name] = (block.name, array.shape, array.dtype.str)
+	return (blocks, descriptors)
+
+# Read the arrays described by the descriptors of create_shared_arrays, the arrays are copied into python lists
+def read_shared_arrays(descriptors):
+	arrays = {}
+	for (name, (block_name, shape, dtype)) in descriptors.items():
+		block = shared_memory.SharedMemory(name = block_name)
+		arrays[name] = np.ndarray(shape, dtype = dtype, buffer = block.buf).tolist()
+		block.close()
+	return arrays
+
+# Compute the product of a transposed CSR matrix {shape, indptr, indices, data} with a vector.
+# SciPy is not a dependency of RapidChiplet, hence, the product is computed using np.bincount.
+def csr_transposed_matvec(matrix, vector):
+	row_lengths = np.diff(matrix["indptr"])
+	weights = matrix["data"] * np.repeat(vector, row_lengths)
+	return np.bincount(matrix["indices"], weights = weights, minlength = matrix["shape"][1])
+
+# Compute the product of a transposed CSR matrix with a dense matrix. All columns are computed in one np.bincount by
+# offsetting the column indices of the CSR matrix by the column of the dense matrix times the number of its columns.
+def csr_transposed_matmat(matrix, dense):
+	(n_cols, n_dense_cols) = (matrix["shape"][1], dense.shape[1])
+	row_lengths = np.diff(matrix["indptr"])
+	weights = matrix["data"][:, np.newaxis] * np.repeat(dense, row_lengths, axis = 0)
+	indices = matrix["indices"][:, np.newaxis] + np.arange(n_dense_cols) * n_cols
+	result = np.bincount(indices.ravel(), weights = weights.ravel(), minlength = n_cols * n_dense_cols)
+	return result.reshape((n_dense_cols, n_cols)).T
+
+# Compiled functions from the packaging file (e.g. "link_latency" or "link_power"), keyed by their source string
+compiled_packaging_expressions = {}
+
+# Compile a function that is given as a lambda expression in the packaging file. Each expression is only compiled once.
+def compile_packaging_expression(expression):
+	if expression not in compiled_packaging_expressions:
+		compiled_packaging_expressions[expression] = eval(expression)
+	return compiled_packaging_expressions[expression]
+
+# Apply a function from the packaging file to a whole array of values at once. Expressions that only use arithmetic
+# operators directly work on NumPy arrays, all other expressions (e.g. using math or conditions) are applied per value.
+def apply_packaging_expression(expression, values):
+	function = compile_packaging_expression(expression)
+	values = np.asarray(values, dtype = float)
+	try:
+		results = np.asarray(function(values), dtype = float)
+		if results.shape == values.shape:
+			return results
+	except (TypeError, ValueError):
+		pass
+	return np.array([function(value) for value in values.tolist()], dtype = float)
+
 # Rotate a chiplet
 def rotate_chiplet(chiplet, rotation):
     # If no rotation is needed, return chiplet as-is
@@ -128,6 +230,220 @@ def construct_ici_graph(chiplets, placement, topology):
 	# Return the constructed graph
 	return {"nodes": nodes, "relay_map": relay_map, "adj_list": adj_list}
 
+# Assign dense integer ids to all nodes and directed links of the ICI graph. Chiplet c has node id c and interposer-
+# router r has node id (number of chiplets + r), i.e., nodes are numbered in the order of the ICI graph's node list.
+# Each link in the topology is used in both directions, directed links are numbered in order of first appearance.
+# The outgoing links of each node are stored in CSR format sorted by the id of the neighbor. This is the order of the
+# sorted adjacency lists of the ICI graph, i.e., the i-th neighbor of node n is adj_nodes[adj_offsets[n] + i].
+def construct_node_index(chiplets, placement, topology):
+	ici_graph = construct_ici_graph(chiplets, placement, topology)
+	nodes = ici_graph["nodes"]
+	node_ids = {node : nid for (nid, node) in enumerate(nodes)}
+	n_nodes = len(nodes)
+	# Assign ids to directed links, store the ids of both directions of each link in the topology
+	links = []
+	link_ids = {}
+	topology_links = np.zeros((len(topology), 2), dtype = np.int64)
+	for (tid, link) in enumerate(topology):
+		node_1 = (link["ep1"]["type"], link["ep1"]["outer_id"])
+		node_2 = (link["ep2"]["type"], link["ep2"]["outer_id"])
+		for (direction, directed_link) in enumerate([(node_1,node_2),(node_2,node_1)]):
+			if directed_link not in link_ids:
+				link_ids[directed_link] = len(links)
+				links.append(directed_link)
+			topology_links[tid, direction] = link_ids[directed_link]
+	link_src = np.array([node_ids[link[0]] for link in links], dtype = np.int64)
+	link_dst = np.array([node_ids[link[1]] for link in links], dtype = np.int64)
+	# Outgoing links in CSR format, sorted by (source node, destination node)
+	adj_keys = link_src * n_nodes + link_dst
+	adj_links = np.argsort(adj_keys, kind = "stable")
+	adj_keys = adj_keys[adj_links]
+	adj_offsets = np.concatenate(([0], np.cumsum(np.bincount(link_src, minlength = n_nodes)))).astype(np.int64)
+	node_index = {
+		"nodes" : nodes,
+		"node_ids" : node_ids,
+		"n_chiplets" : len(placement["chiplets"]),
+		"relay" : np.array([ici_graph["relay_map"][node] for node in nodes], dtype = bool),
+		"links" : links,
+		"link_ids" : link_ids,
+		"link_src" : link_src,
+		"link_dst" : link_dst,
+		"topology_links" : topology_links,
+		"adj_offsets" : adj_offsets,
+		"adj_nodes" : link_dst[adj_links],
+		"adj_links" : adj_links,
+		"adj_keys" : adj_keys,
+	}
+	# Port through which each link enters its destination node: 0 is the injection port, port i+1 is the link
+	# coming from the i-th neighbor (links are bidirectional, hence, each neighbor is also an in-neighbor)
+	in_positions = find_adjacency_positions(node_index, link_dst, link_src)
+	node_index["link_in_ports"] = in_positions - adj_offsets[link_dst] + 1
+	return node_index
+
+# Find the positions of the directed links (src -> dst) in the CSR format of the node index, -1 if there is no such link
+def find_adjacency_positions(node_index, src, dst):
+	adj_keys = node_index["adj_keys"]
+	if len(adj_keys) == 0:
+		return np.full(np.shape(src), -1, dtype = np.int64)
+	keys = np.asarray(src) * len(node_index["nodes"]) + np.asarray(dst)
+	positions = np.minimum(np.searchsorted(adj_keys, keys), len(adj_keys) - 1)
+	return np.where((adj_keys[positions] == keys) & (np.asarray(dst) >= 0), positions, -1)
+
+# Compress an "extended" routing table into a "compressed" routing table. For each (node, destination), the most common
+# next hop is stored as the default and only the previous nodes whose next hop differs are stored as exceptions:
+# {(cur_type, cur_id) -> {(dst_type, dst_id) -> {"default" : (next_type, next_id), "exceptions" : {prev -> next}}}}
+# Previous nodes that are not listed as exceptions use the default next hop (None if there is no route).
+def compress_routing_table(routing_table_):
+	if routing_table_["type"] != "extended":
+		print("ERROR: Only \"extended\" routing tables can be compressed, the routing table type is %s" % routing_table_["type"])
+		sys.exit(1)
+	table = {}
+	for (node, entries) in routing_table_["table"].items():
+		table[node] = {}
+		for (dst_node, entries_by_prv) in entries.items():
+			counts = {}
+			for nxt_node in entries_by_prv.values():
+				counts[nxt_node] = counts.get(nxt_node, 0) + 1
+			default = max(counts, key = counts.get) if len(counts) > 0 else None
+			exceptions = {prv_node : nxt_node for (prv_node, nxt_node) in entries_by_prv.items() if nxt_node != default}
+			table[node][dst_node] = {"default" : default, "exceptions" : exceptions}
+	return {"type" : "compressed", "table" : table}
+
+# Convert a routing table into an array of next hops (node ids), -1 denotes a missing entry.
+# "default" tables are converted to an array [node, destination chiplet], "extended" tables are converted to an
+# array [node, destination chiplet, input port] where port 0 is the injection port and port i+1 is the link
+# coming from the i-th neighbor of the node. "compressed" tables are converted to the same array as "extended" tables,
+# the default next hop is used for all input ports of the node that are not listed as exceptions.
+def convert_routing_table_to_next_hops(routing_table_, node_index):
+	routing_table_type = routing_table_["type"]
+	# Algorithmic routing tables compute next hops on demand, there is nothing to convert (see algorithmic_routing.py)
+	if routing_table_type == "algorithmic":
+		return {"type" : "algorithmic", "routing_table" : routing_table_}
+	routing_table = routing_table_["table"]
+	nodes = node_index["nodes"]
+	node_ids = node_index["node_ids"]
+	adj_offsets = node_index["adj_offsets"]
+	n_chiplets = node_index["n_chiplets"]
+	# Routing tables read from an array file already are arrays of next hops
+	if "next_hops" in routing_table_:
+		return {"type" : routing_table_type, "next_hops" : routing_table_["next_hops"]}
+	if routing_table_type == "default":
+		next_hops = np.full((len(nodes), n_chiplets), -1, dtype = np.int64)
+		for (node, entries) in routing_table.items():
+			nid = node_ids[tuple(node)]
+			for (dst_node, nxt_node) in entries.items():
+				if nxt_node is not None:
+					next_hops[nid, dst_node[1]] = node_ids[tuple(nxt_node)]
+	elif routing_table_type == "extended":
+		n_ports = int(np.max(np.diff(adj_offsets), initial = 0)) + 1
+		next_hops = np.full((len(nodes), n_chiplets, n_ports), -1, dtype = np.int64)
+		for (node, entries) in routing_table.items():
+			nid = node_ids[tuple(node)]
+			ports = {nodes[nbr] : port + 1 for (port, nbr) in enumerate(node_index["adj_nodes"][adj_offsets[nid]:adj_offsets[nid+1]].tolist())}
+			for (dst_node, entries_by_prv) in entries.items():
+				for (prv_node, nxt_node) in entries_by_prv.items():
+					if nxt_node is not None:
+						port = 0 if prv_node in ("-1", -1) else ports[tuple(prv_node)]
+						next_hops[nid, dst_node[1], port] = node_ids[tuple(nxt_node)]
+	elif routing_table_type == "compressed":
+		n_ports = int(np.max(np.diff(adj_offsets), initial = 0)) + 1
+		next_hops = np.full((len(nodes), n_chiplets, n_ports), -1, dtype = np.int64)
+		for (node, entries) in routing_table.items():
+			nid = node_ids[tuple(node)]
+			ports = {nodes[nbr] : port + 1 for (port, nbr) in enumerate(node_index["adj_nodes"][adj_offsets[nid]:adj_offsets[nid+1]].tolist())}
+			for (dst_node, entry) in entries.items():
+				if entry["default"] is not None:
+					next_hops[nid, dst_node[1], :len(ports) + 1] = node_ids[tuple(entry["default"])]
+				for (prv_node, nxt_node) in entry["exceptions"].items():
+					port = 0 if prv_node in ("-1", -1) else ports[tuple(prv_node)]
+					next_hops[nid, dst_node[1], port] = node_ids[tuple(nxt_node)] if nxt_node is not None else -1
+		routing_table_type = "extended"
+	else:
+		print("ERROR: Unknown routing table type %s" % routing_table_type)
+		sys.exit(1)	
+	return {"type" : routing_table_type, "next_hops" : next_hops}
+
+# Write a routing table as an int32 array of next hops (see convert_routing_table_to_next_hops) to a .npy file.
+# The type of the routing table is given by the number of dimensions of the array (2: "default", 3: "extended").
+def write_routing_table_array(filename, routing_table_, node_index):
+	next_hops = convert_routing_table_to_next_hops(routing_table_, node_index)["next_hops"]
+	np.save(filename, next_hops.astype(np.int32))
+
+# Read a routing table from a .npy file. The array is memory-mapped, the "table" is a dict-compatible view of it.
+def read_routing_table_array(filename, node_index):
+	next_hops = np.load(filename, mmap_mode = "r")
+	routing_table_type = {2 : "default", 3 : "extended"}.get(next_hops.ndim, None)
+	if routing_table_type is None:
+		print("ERROR: The routing table array in %s has %d dimensions, expected 2 (default) or 3 (extended)" % (filename, next_hops.ndim))
+		sys.exit(1)
+	n_ports = int(np.max(np.diff(node_index["adj_offsets"]), initial = 0)) + 1
+	expected_shape = (len(node_index["nodes"]), node_index["n_chiplets"]) + ((n_ports,) if routing_table_type == "extended" else ())
+	if next_hops.shape != expected_shape:
+		print("ERROR: The routing table array in %s has shape %s, the design requires shape %s" % (filename, str(next_hops.shape), str(expected_shape)))
+		sys.exit(1)
+	table = RoutingTableView(next_hops, node_index)
+	return {"type" : routing_table_type, "table" : table, "next_hops" : next_hops}
+
+# Read-only view of an array of next hops that behaves like the nested dicts of a JSON routing table, i.e.,
+# table[node][dst] is the next node ("default") or a dict {prev -> next node} ("extended", prev = "-1" for injection).
+# Entries are looked up in the array on access, the nested dicts are never constructed.
+class RoutingTableView(collections.abc.Mapping):
+	def __init__(self, next_hops, node_index, nid = None, did = None):
+		self.next_hops = next_hops
+		self.node_index = node_index
+		(self.nid, self.did) = (nid, did)
+
+	# Keys of this level of the table and the corresponding index into the array
+	def keys_and_ids(self):
+		nodes = self.node_index["nodes"]
+		if self.nid is None:
+			return [(node, nid) for (nid, node) in enumerate(nodes)]
+		elif self.did is None:
+			extended = self.next_hops.ndim == 3
+			return [(nodes[did], did) for did in range(self.node_index["n_chiplets"]) if not (extended and did == self.nid)]
+		else:
+			(adj_offsets, adj_nodes) = (self.node_index["adj_offsets"], self.node_index["adj_nodes"])
+			prevs = [("-1", 0)] + [(nodes[nbr], port + 1) for (port, nbr) in enumerate(adj_nodes[adj_offsets[self.nid]:adj_offsets[self.nid+1]].tolist())]
+			return [(prev, port) for (prev, port) in prevs if self.next_hops[self.nid, self.did, port] >= 0]
+
+	# Index into the array for a single key, None if the key is not in this level of the table
+	def key_to_id(self, key):
+		key = tuple(key) if isinstance(key, list) else key
+		node_ids = self.node_index["node_ids"]
+		if self.nid is None:
+			return node_ids.get(key, None)
+		elif self.did is None:
+			did = node_ids.get(key, -1)
+			is_valid = 0 <= did < self.node_index["n_chiplets"] and not (self.next_hops.ndim == 3 and did == self.nid)
+			return did if is_valid else None
+		else:
+			if key in ("-1", -1):
+				port = 0
+			else:
+				position = int(find_adjacency_positions(self.node_index, self.nid, node_ids.get(key, -1)))
+				port = position - int(self.node_index["adj_offsets"][self.nid]) + 1 if position >= 0 else None
+			return port if port is not None and self.next_hops[self.nid, self.did, port] >= 0 else None
+
+	def __getitem__(self, key):
+		kid = self.key_to_id(key)
+		if kid is None:
+			raise KeyError(key)
+		if self.nid is None:
+			return RoutingTableView(self.next_hops, self.node_index, kid)
+		elif self.did is None and self.next_hops.ndim == 3:
+			return RoutingTableView(self.next_hops, self.node_index, self.nid, kid)
+		nxt = int(self.next_hops[(self.nid, kid) if self.did is None else (self.nid, self.did, kid)])
+		return self.node_index["nodes"][nxt] if nxt >= 0 else None
+
+	def __contains__(self, key):
+		return self.key_to_id(key) is not None
+
+	def __iter__(self):
+		return iter([key for (key, kid) in self.keys_and_ids()])
+
+	def __len__(self):
+		return len(self.keys_and_ids())
+
 def convert_by_unit_traffic_to_by_chiplet_traffic(traffic_by_unit):
 	traffic_by_chiplet = {}
 	for ((src_cid, src_uid),(dst_cid, dst_uid)) in traffic_by_unit.keys():
@@ -0,0 +1,194 @@
+# Import python libraries
+import sys
+import numpy as np
+
+# Import RapidChiplet files
+import helpers as hlp
+import rapidchiplet as rc
+import generate_routing as gr
+
+# An evaluation session holds the ICI graph, the shortest-path-lowest-id-first (splif) routing, and the link loads and
+# latencies of a design. When a link is added or removed, only the affected link properties and the routing trees
+# of the affected destinations are updated, such that the latency and throughput can be re-evaluated quickly.
+# Nodes and links use the dense integer ids of hlp.construct_node_index. New links are appended, removed links are
+# kept as dead slots such that the ids of all other links remain valid.
+
+################################################################################################################
+# Session
+################################################################################################################
+
+def create_session(inputs, verbose = False, validate = True):
+	inputs["verbose"] = verbose
+	inputs["validate"] = validate
+	# Load inputs if not already loaded
+	required_inputs = ["chiplets","packaging","placement","technologies","topology","traffic_by_chiplet"]
+	hlp.read_required_inputs(inputs, required_inputs)
+	intermediates = {}
+	required_intermediates = ["node_index","phy_table","link_lengths","link_latencies","link_bandwidths","node_latencies"]
+	hlp.compute_required_intermediates(inputs, intermediates, required_intermediates)
+	node_index = intermediates["node_index"]
+	n_nodes = len(node_index["nodes"])
+	# Adjacency list: adj_list[n] maps each neighbor of node n to the id of the link from n to that neighbor
+	adj_list = [{} for nid in range(n_nodes)]
+	for (lid, (src, dst)) in enumerate(zip(node_index["link_src"].tolist(), node_index["link_dst"].tolist())):
+		adj_list[src][dst] = lid
+	# Traffic that is sent to each destination chiplet
+	traffic_by_destination = {}
+	for ((sid, did), load) in inputs["traffic_by_chiplet"].items():
+		traffic_by_destination.setdefault(did, []).append((sid, load))
+	session = {
+		"inputs" : inputs,
+		"intermediates" : intermediates,
+		"n_chiplets" : node_index["n_chiplets"],
+		"nodes" : node_index["nodes"],
+		"node_ids" : node_index["node_ids"],
+		"relay" : node_index["relay"].tolist(),
+		"adj_list" : adj_list,
+		"links" : list(zip(node_index["link_src"].tolist(), node_index["link_dst"].tolist())),
+		"is_alive" : [True] * len(node_index["links"]),
+		"link_lengths" : intermediates["link_lengths"].tolist(),
+		"link_latencies" : intermediates["link_latencies"].tolist(),
+		"link_bandwidths" : intermediates["link_bandwidths"].tolist(),
+		"endpoint_latencies" : intermediates["node_latencies"]["endpoint"].tolist(),
+		"relay_latencies" : intermediates["node_latencies"]["relay"].tolist(),
+		"traffic_by_destination" : traffic_by_destination,
+		# Routing trees by destination chiplet
+		"dists" : {},
+		"next_hops" : {},
+		# Link loads (by destination and aggregated) and latency statistics (by destination)
+		"link_loads_by_destination" : {},
+		"link_loads" : [0.0] * len(node_index["links"]),
+		"latency_by_destination" : {},
+	}
+	# Compute the routing tree of each destination chiplet
+	for did in range(session["n_chiplets"]):
+		update_destination(session, did)
+	return session
+
+# Recompute the routing tree of a destination and the link loads and latencies of the traffic sent to it
+def update_destination(session, did):
+	(dists, nexts, order) = gr.shortest_path_lowest_id_first_tree(session["adj_list"], session["relay"], session["n_chiplets"], did)
+	session["dists"][did] = dists
+	session["next_hops"][did] = nexts
+	if did not in session["traffic_by_destination"]:
+		return
+	adj_list = session["adj_list"]
+	link_latencies = session["link_latencies"]
+	relay_latencies = session["relay_latencies"]
+	# Path latency from each node to the destination (links and relaying nodes), nodes are discovered in order of distance
+	path_latencies = [0] * len(adj_list)
+	for node in order[1:]:
+		nxt = nexts[node]
+		path_latencies[node] = link_latencies[adj_list[node][nxt]] + (relay_latencies[nxt] if nxt != did else 0) + path_latencies[nxt]
+	# Traffic that enters the network at each node, accumulated from the leaves of the tree towards the destination
+	subtree_loads = [0.0] * len(adj_list)
+	latencies = []
+	for (sid, load) in session["traffic_by_destination"][did]:
+		if dists[sid] < 0:
+			print("ERROR: Unable to find a path from node %s to node %s" % (str(session["nodes"][sid]), str(session["nodes"][did])))
+			sys.exit(1)
+		subtree_loads[sid] += load
+		latencies.append((path_latencies[sid] + session["endpoint_latencies"][sid] + session["endpoint_latencies"][did] + 3, load))
+	link_loads = {}
+	for node in reversed(order[1:]):
+		if subtree_loads[node] > 0:
+			nxt = nexts[node]
+			link_loads[adj_list[node][nxt]] = subtree_loads[node]
+			subtree_loads[nxt] += subtree_loads[node]
+	# Replace the link loads of this destination in the aggregated link loads
+	aggregated_link_loads = session["link_loads"]
+	for (lid, load) in session["link_loads_by_destination"].get(did, {}).items():
+		aggregated_link_loads[lid] -= load
+	for (lid, load) in link_loads.items():
+		aggregated_link_loads[lid] += load
+	session["link_loads_by_destination"][did] = link_loads
+	# Minimum, traffic-weighted sum, and maximum of the latencies of all flows towards this destination
+	session["latency_by_destination"][did] = {
+		"min" : min([lat for (lat, load) in latencies]),
+		"weighted_sum" : sum([lat * load for (lat, load) in latencies]),
+		"max" : max([lat for (lat, load) in latencies]),
+	}
+
+################################################################################################################
+# Topology edits
+################################################################################################################
+
+# Add a link, given in the format of the topology input, e.g., {"ep1" : {"type" : "chiplet", "outer_id" : 0, "inner_id" : 1}, "ep2" : ...}
+def add_link(session, link):
+	inputs = session["inputs"]
+	intermediates = session["intermediates"]
+	node_1 = session["node_ids"][(link["ep1"]["type"], link["ep1"]["outer_id"])]
+	node_2 = session["node_ids"][(link["ep2"]["type"], link["ep2"]["outer_id"])]
+	if node_2 in session["adj_list"][node_1]:
+		print("ERROR: The nodes %s and %s are already connected" % (str(session["nodes"][node_1]), str(session["nodes"][node_2])))
+		sys.exit(1)
+	inputs["topology"].append(link)
+	# Compute the length, latency, and bandwidth of the new link
+	length = rc.get_topology_link_lengths(inputs["packaging"], inputs["placement"], intermediates["phy_table"], [link])
+	latency = rc.get_link_latencies_from_lengths(inputs["packaging"], length)
+	bandwidth = rc.get_topology_link_bandwidths(intermediates["phy_table"], [link])
+	# Both directions of the link are appended to the list of links
+	for (src, dst) in [(node_1, node_2), (node_2, node_1)]:
+		session["adj_list"][src][dst] = len(session["links"])
+		session["links"].append((src, dst))
+		session["is_alive"].append(True)
+		session["link_lengths"].append(length[0].item())
+		session["link_latencies"].append(latency[0].item())
+		session["link_bandwidths"].append(bandwidth[0].item())
+		session["link_loads"].append(0.0)
+	# The new link only changes the routing towards a destination if it connects nodes with different distances
+	for did in range(session["n_chiplets"]):
+		dists = session["dists"][did]
+		if dists[node_1] != dists[node_2]:
+			update_destination(session, did)
+
+# Remove the link between two nodes, given as (type, id) tuples, e.g., ("chiplet", 0) and ("irouter", 3)
+def remove_link(session, node_1, node_2):
+	inputs = session["inputs"]
+	(nid_1, nid_2) = (session["node_ids"][tuple(node_1)], session["node_ids"][tuple(node_2)])
+	if nid_2 not in session["adj_list"][nid_1]:
+		print("ERROR: The nodes %s and %s are not connected" % (str(tuple(node_1)), str(tuple(node_2))))
+		sys.exit(1)
+	inputs["topology"] = [link for link in inputs["topology"] if set([(ep["type"], ep["outer_id"]) for ep in (link["ep1"], link["ep2"])]) != set([tuple(node_1), tuple(node_2)])]
+	# Both directions of the link become dead slots
+	for (src, dst) in [(nid_1, nid_2), (nid_2, nid_1)]:
+		session["is_alive"][session["adj_list"][src].pop(dst)] = False
+	# Removing the link only changes the routing towards a destination if the link is used in its routing tree
+	for did in range(session["n_chiplets"]):
+		nexts = session["next_hops"][did]
+		if nexts[nid_1] == nid_2 or nexts[nid_2] == nid_1:
+			update_destination(session, did)
+
+################################################################################################################
+# Evaluation
+################################################################################################################
+
+# Compute the latency and throughput of the current design, the results have the same format as the outputs of rapidchiplet
+def evaluate_session(session):
+	latency_by_destination = session["latency_by_destination"].values()
+	total_traffic = sum(session["inputs"]["traffic_by_chiplet"].values())
+	latency = {
+		"min" : min([x["min"] for x in latency_by_destination]),
+		"avg" : sum([x["weighted_sum"] for x in latency_by_destination]) / total_traffic,
+		"max" : max([x["max"] for x in latency_by_destination]),
+	}
+	# The throughput is limited by the link with the lowest throughput per unit of traffic
+	link_loads = np.array(session["link_loads"])
+	link_bandwidths = np.array(session["link_bandwidths"])
+	is_loaded = np.array(session["is_alive"]) & (link_loads > 0)
+	min_throughput_per_traffic_unit = np.min(link_bandwidths[is_loaded] / link_loads[is_loaded], initial = float("inf"))
+	throughput = {
+		"aggregate_throughput" : float(min_throughput_per_traffic_unit) * total_traffic,
+	}
+	return {"latency" : latency, "throughput" : throughput}
+
+# Export the routing of the current design as a "default" routing table in the format of the routing table input
+def export_routing_table(session):
+	nodes = session["nodes"]
+	chiplets = nodes[:session["n_chiplets"]]
+	routing_table = {node : {dst : None for dst in chiplets} for node in nodes}
+	for (did, nexts) in session["next_hops"].items():
+		for (nid, nxt) in enumerate(nexts):
+			if nxt >= 0:
+				routing_table[nodes[nid]][nodes[did]] = nodes[nxt]
+	return {"type" : "default", "table" : routing_table}
@@ -3,110 +3,321 @@ import sys
 import math
 import time
 import argparse
+import concurrent.futures
+import numpy as np
 
 # Import RapidChiplet files
 import helpers as hlp
 import booksim_wrapper as bsw
+import algorithmic_routing as ar
 
 ################################################################################################################
 # Intermediates
 ################################################################################################################
 
-def compute_link_lengths(inputs, intermediates):
+# Positions and bandwidths of all PHYs, computed once per (chiplet name, rotation) that is used in the placement
+# The PHYs of all used (chiplet name, rotation) pairs are stored back-to-back, PHY p of chiplet c is found at
+# index chiplet_offsets[c] + p of the positions (in mm, relative to the bottom-left corner) and bandwidths arrays.
+def compute_phy_table(inputs, intermediates):
 	# Load inputs if not already loaded
-	required_inputs = ["chiplets","packaging","placement","topology"]
+	required_inputs = ["chiplets","packaging","placement"]
 	hlp.read_required_inputs(inputs, required_inputs)
 	chiplets = inputs["chiplets"]
 	packaging = inputs["packaging"]
 	placement = inputs["placement"]
+	pb = packaging["bump_pitch"]														# Bump pitch in mm
+	ndw = packaging["non_data_wires"]													# Number of non-data wires per link
+	# Offsets of the PHYs of each (chiplet name, rotation) pair
+	offsets = {}
+	positions = []
+	bandwidths = []
+	for chiplet_desc in placement["chiplets"]:
+		key = (chiplet_desc["name"], chiplet_desc["rotation"])
+		if key not in offsets:
+			offsets[key] = len(positions)
+			# Rotate the chiplet if needed, this is done only once per (chiplet name, rotation) pair
+			chiplet = chiplets[chiplet_desc["name"]]
+			rotated_chiplet = hlp.rotate_chiplet(chiplet, chiplet_desc["rotation"])
+			for (phy, rotated_phy) in zip(chiplet["phys"], rotated_chiplet["phys"]):
+				positions.append((rotated_phy["x"], rotated_phy["y"]))
+				ac = chiplet["dimensions"]["x"] * chiplet["dimensions"]["y"]			# Chiplet area in mm^2
+				fp = chiplet["fraction_power_bumps"]									# Fraction of bumps used for power 
+				fca = phy["fraction_bump_area"]											# Fraction of bump area	use by PHY
+				bandwidths.append(int(math.floor((ac * (1-fp) * fca * (1/pb)**2) - ndw)))	# Link bandwidth in bit/cycle
+	# Aggregate results
+	phy_table = {
+		"offsets" : offsets,
+		"chiplet_offsets" : np.array([offsets[(x["name"], x["rotation"])] for x in placement["chiplets"]], dtype = np.int64),
+		"positions" : np.array(positions, dtype = float).reshape((-1, 2)),
+		"bandwidths" : np.array(bandwidths, dtype = float),
+	}
+	# Return results
+	return phy_table
+
+# Dense integer ids of all nodes and directed links, see hlp.construct_node_index
+def compute_node_index(inputs, intermediates):
+	# Load inputs if not already loaded
+	required_inputs = ["chiplets","placement","topology"]
+	hlp.read_required_inputs(inputs, required_inputs)
+	chiplets = inputs["chiplets"]
+	placement = inputs["placement"]
+	topology = inputs["topology"]
+	# Construct the node index
+	node_index = hlp.construct_node_index(chiplets, placement, topology)
+	# Return results
+	return node_index
+
+# Extract the types and ids of both endpoints of all links in the topology as arrays with one row per endpoint
+def get_link_endpoints(topology):
+	endpoints = [[link["ep1"] for link in topology], [link["ep2"] for link in topology]]
+	link_endpoints = {
+		"is_chiplet" : np.array([[ep["type"] == "chiplet" for ep in eps] for eps in endpoints], dtype = bool).reshape((2, -1)),
+		"outer_ids" : np.array([[ep["outer_id"] for ep in eps] for eps in endpoints], dtype = np.int64).reshape((2, -1)),
+		"inner_ids" : np.array([[ep["inner_id"] for ep in eps] for eps in endpoints], dtype = np.int64).reshape((2, -1)),
+	}
+	return link_endpoints
+
+# Store a per-link value of each link in the topology for both directions of the link in an array indexed by link id
+def scatter_topology_link_values(node_index, values):
+	topology_links = node_index["topology_links"]
+	link_values = np.zeros(len(node_index["links"]), dtype = float)
+	link_values[topology_links[:, 0]] = values
+	link_values[topology_links[:, 1]] = values
+	return link_values
+
+# Length of each link in the topology (in mm)
+def get_topology_link_lengths(packaging, placement, phy_table, topology):
+	link_endpoints = get_link_endpoints(topology)
+	is_chiplet = link_endpoints["is_chiplet"]
+	outer_ids = link_endpoints["outer_ids"]
+	inner_ids = link_endpoints["inner_ids"]
+	# Positions of chiplets and interposer routers
+	chiplet_positions = np.array([(x["position"]["x"], x["position"]["y"]) for x in placement["chiplets"]], dtype = float).reshape((-1, 2))
+	irouter_positions = np.array([(x["position"]["x"], x["position"]["y"]) for x in placement["interposer_routers"]], dtype = float).reshape((-1, 2))
+	# Compute positions of both link-endpoints: Chiplet position plus PHY position or interposer router position
+	positions = np.zeros(is_chiplet.shape + (2,))
+	if np.any(is_chiplet):
+		chiplet_ids = outer_ids[is_chiplet]
+		phy_ids = phy_table["chiplet_offsets"][chiplet_ids] + inner_ids[is_chiplet]
+		positions[is_chiplet] = chiplet_positions[chiplet_ids] + phy_table["positions"][phy_ids]
+	if not np.all(is_chiplet):
+		positions[~is_chiplet] = irouter_positions[outer_ids[~is_chiplet]]
+	# Compute link lengths
+	distances = np.abs(positions[0] - positions[1])
+	if packaging["link_routing"] == "manhattan":
+		lengths = distances[:, 0] + distances[:, 1]
+	elif packaging["link_routing"] == "euclidean":
+		lengths = np.sqrt(distances[:, 0]**2 + distances[:, 1]**2)
+	return lengths
+
+# Latency of links with the given lengths (in cycles). If the latency is a function of the link length, it is applied to all links at once.
+def get_link_latencies_from_lengths(packaging, lengths):
+	if packaging["link_latency_type"] == "constant":
+		return np.full(len(lengths), int(math.ceil(packaging["link_latency"])), dtype = np.int64)
+	else:
+		return np.ceil(hlp.apply_packaging_expression(packaging["link_latency"], lengths.tolist())).astype(np.int64)
+
+# Bandwidth of each link in the topology (in bit/cycle per direction)
+def get_topology_link_bandwidths(phy_table, topology):
+	link_endpoints = get_link_endpoints(topology)
+	is_chiplet = link_endpoints["is_chiplet"]
+	# The bandwidth of a link is limited by the PHYs at its endpoints (interposer routers do not limit the bandwidth)
+	endpoint_bandwidths = np.full(is_chiplet.shape, float("inf"))
+	if np.any(is_chiplet):
+		phy_ids = phy_table["chiplet_offsets"][link_endpoints["outer_ids"][is_chiplet]] + link_endpoints["inner_ids"][is_chiplet]
+		endpoint_bandwidths[is_chiplet] = phy_table["bandwidths"][phy_ids]
+	# Divide by 2 because each link is counted twice, once in each direction
+	return np.min(endpoint_bandwidths, axis = 0) / 2.0
+
+def compute_link_lengths(inputs, intermediates):
+	# Load inputs if not already loaded
+	required_inputs = ["packaging","placement","topology"]
+	hlp.read_required_inputs(inputs, required_inputs)
+	packaging = inputs["packaging"]
+	placement = inputs["placement"]
 	topology = inputs["topology"]
-	# Iterate through the links in the topology
-	link_lengths = {}
-	for link in topology:
-		endpoints = [link["ep1"],link["ep2"]]
-		# Compute positions of both link-endpoints
-		positions = []
-		node_ids = []
-		for endpoint in endpoints:
-			# Endpoint is a chiplet
-			if endpoint["type"] == "chiplet":
-				chiplet_desc = placement["chiplets"][endpoint["outer_id"]]
-				chiplet = chiplets[chiplet_desc["name"]]
-				# Rotate the chiplet if needed  
-				chiplet = hlp.rotate_chiplet(chiplet, chiplet_desc["rotation"])
-				phy = chiplet["phys"][endpoint["inner_id"]]
-				positions.append((chiplet_desc["position"]["x"] + phy["x"],chiplet_desc["position"]["y"] + phy["y"]))
-				node_ids.append(("chiplet", endpoint["outer_id"]))
-			# Endpoint is an interposer router
-			else:
-				irouter = placement["interposer_routers"][endpoint["outer_id"]]
-				positions.append((irouter["position"]["x"],irouter["position"]["y"]))
-				node_ids.append(("irouter", endpoint["outer_id"]))
-		# Compute link length
-		if packaging["link_routing"] == "manhattan":
-			length = sum([abs(positions[0][dim] - positions[1][dim]) for dim in range(2)])
-		elif packaging["link_routing"] == "euclidean":
-			length =  math.sqrt(sum([abs(positions[0][dim] - positions[1][dim])**2 for dim in range(2)]))
-		link_lengths[tuple(node_ids)] = length
-		link_lengths[tuple(reversed(node_ids))] = length
+	# Compute intermediates if not already computed
+	required_intermediates = ["node_index", "phy_table"]
+	hlp.compute_required_intermediates(inputs, intermediates, required_intermediates)
+	node_index = intermediates["node_index"]
+	phy_table = intermediates["phy_table"]
+	# Store the link lengths by link id
+	link_lengths = scatter_topology_link_values(node_index, get_topology_link_lengths(packaging, placement, phy_table, topology))
 	# Return results
 	return link_lengths
 
 def compute_link_latencies(inputs, intermediates):
 	# Load inputs if not already loaded
-	required_inputs = ["packaging","topology"]
+	required_inputs = ["packaging"]
 	hlp.read_required_inputs(inputs, required_inputs)
 	packaging = inputs["packaging"]
-	topology = inputs["topology"]
 	# Load intermediates if not already loaded
 	required_intermediates = ["link_lengths"]
 	hlp.compute_required_intermediates(inputs, intermediates, required_intermediates)
 	link_lengths = intermediates["link_lengths"]
 	# Compute per-link latencies
-	link_latencies = {}
-	for link in topology:
-		node_id_1 = (link["ep1"]["type"],link["ep1"]["outer_id"])
-		node_id_2 = (link["ep2"]["type"],link["ep2"]["outer_id"])
-		if packaging["link_latency_type"] == "constant":
-			lat = int(math.ceil(packaging["link_latency"]))
-		else:
-			lat = int(math.ceil(eval(packaging["link_latency"])(link_lengths[(node_id_1,node_id_2)])))
-		link_latencies[(node_id_1,node_id_2)] = lat
-		link_latencies[(node_id_2,node_id_1)] = lat
+	link_latencies = get_link_latencies_from_lengths(packaging, link_lengths)
 	# Return results
 	return link_latencies
 
 def compute_link_bandwidths(inputs, intermediates):
 	# Load inputs if not already loaded
-	required_inputs = ["chiplets","packaging","placement","topology"]
+	required_inputs = ["topology"]
 	hlp.read_required_inputs(inputs, required_inputs)
-	chiplets = inputs["chiplets"]
-	packaging = inputs["packaging"]
-	placement = inputs["placement"]
 	topology = inputs["topology"]
-	# Compute per-link bandwidths
-	link_bandwidths = {}
-	for link in topology:
-		link_bw = float("inf")
-		for ep_lab in [x for x in link.keys() if "ep" in x]:
-			ep = link[ep_lab]
-			if ep["type"] == "chiplet":
-				chiplet = chiplets[placement["chiplets"][ep["outer_id"]]["name"]]
-				phy = chiplet["phys"][ep["inner_id"]]
-				ac = chiplet["dimensions"]["x"] * chiplet["dimensions"]["y"]			# Chiplet area in mm^2
-				fp = chiplet["fraction_power_bumps"]									# Fraction of bumps used for power 
-				fca = phy["fraction_bump_area"]											# Fraction of bump area	use by PHY
-				pb = packaging["bump_pitch"]											# Bump pitch in mm
-				ndw = packaging["non_data_wires"]										# Number of non-data wires per link
-				lbw = int(math.floor((ac * (1-fp) * fca * (1/pb)**2) - ndw))			# Link bandwidth in bit/cycle
-				link_bw = min(link_bw, lbw)
-		node_id_1 = (link["ep1"]["type"],link["ep1"]["outer_id"])
-		node_id_2 = (link["ep2"]["type"],link["ep2"]["outer_id"])
-		link_bandwidths[(node_id_1,node_id_2)] = link_bw / 2.0			# Divide by 2 because each link is counted twice, once in each direction
-		link_bandwidths[(node_id_2,node_id_1)] = link_bw / 2.0			# Divide by 2 because each link is counted twice, once in each direction
+	# Compute intermediates if not already computed
+	required_intermediates = ["node_index", "phy_table"]
+	hlp.compute_required_intermediates(inputs, intermediates, required_intermediates)
+	node_index = intermediates["node_index"]
+	phy_table = intermediates["phy_table"]
+	# Store the link bandwidths by link id
+	link_bandwidths = scatter_topology_link_values(node_index, get_topology_link_bandwidths(phy_table, topology))
 	# Return results
 	return link_bandwidths
 
+# The routing table as an array of next hops, see hlp.convert_routing_table_to_next_hops. Algorithmic routing tables
+# are not converted, their next hops are computed when needed (see algorithmic_routing.py).
+def compute_next_hops(inputs, intermediates):
+	# Load inputs if not already loaded
+	required_inputs = ["routing_table"]
+	hlp.read_required_inputs(inputs, required_inputs)
+	routing_table = inputs["routing_table"]
+	# Compute intermediates if not already computed
+	required_intermediates = ["node_index"]
+	hlp.compute_required_intermediates(inputs, intermediates, required_intermediates)
+	node_index = intermediates["node_index"]
+	# Convert the routing table
+	next_hops = hlp.convert_routing_table_to_next_hops(routing_table, node_index)
+	if next_hops["type"] == "algorithmic":
+		problems = ar.check_algorithmic_routing(routing_table, node_index)
+		if len(problems) > 0:
+			print("ERROR: " + " ".join(problems))
+			sys.exit(1)
+	# Return results
+	return next_hops
+
+# Compile the path of each given (source chiplet, destination chiplet) flow into a sequence of link ids.
+# All flows are advanced by one hop at a time.
+def compile_flow_paths(next_hops_, node_index, flows):
+	routing_table_type = next_hops_["type"]
+	# Chiplet c has node id c
+	sources = np.array([sid for (sid, did) in flows], dtype = np.int64)
+	destinations = np.array([did for (sid, did) in flows], dtype = np.int64)
+	# Current node and input port (0 = injection port) of each flow
+	cur_nodes = sources.copy()
+	cur_ports = np.zeros(len(flows), dtype = np.int64)
+	# Flow id and link id of each hop
+	hop_flows = []
+	hop_links = []
+	active = np.nonzero(cur_nodes != destinations)[0]
+	n_hops = 0
+	while len(active) > 0:
+		if routing_table_type == "default":
+			nxt_nodes = next_hops_["next_hops"][cur_nodes[active], destinations[active]]
+		elif routing_table_type == "extended":
+			nxt_nodes = next_hops_["next_hops"][cur_nodes[active], destinations[active], cur_ports[active]]
+		elif routing_table_type == "algorithmic":
+			nxt_nodes = ar.compute_algorithmic_next_hops(next_hops_["routing_table"], cur_nodes[active], destinations[active])
+		else:
+			print("ERROR: Unknown routing table type %s" % routing_table_type)
+			sys.exit(1)	
+		positions = hlp.find_adjacency_positions(node_index, cur_nodes[active], nxt_nodes)
+		if np.any(positions < 0):
+			fid = active[np.argmax(positions < 0)]
+			print("ERROR: The routing table does not specify a valid next hop for the flow from chiplet %d to chiplet %d" % flows[fid])
+			sys.exit(1)
+		# A path can not contain more hops than there are states (node, input port) in the routing table
+		n_hops += 1
+		if n_hops > (next_hops_["next_hops"][:, 0].size if routing_table_type != "algorithmic" else len(node_index["nodes"])):
+			print("ERROR: The routing table contains a loop on the path from chiplet %d to chiplet %d" % flows[active[0]])
+			sys.exit(1)
+		# Move to the next node
+		link_ids = node_index["adj_links"][positions]
+		hop_flows.append(active)
+		hop_links.append(link_ids)
+		cur_nodes[active] = nxt_nodes
+		cur_ports[active] = node_index["link_in_ports"][link_ids]
+		active = active[nxt_nodes != destinations[active]]
+	# Group the hops by flow, the stable sort preserves the order of hops within each flow.
+	# The paths of all flows are stored back-to-back in path_links, the links of flow i are
+	# path_links[path_offsets[i]:path_offsets[i+1]]
+	hop_flows = np.concatenate(hop_flows) if len(hop_flows) > 0 else np.zeros(0, dtype = np.int64)
+	hop_links = np.concatenate(hop_links) if len(hop_links) > 0 else np.zeros(0, dtype = np.int64)
+	order = np.argsort(hop_flows, kind = "stable")
+	path_offsets = np.concatenate(([0], np.cumsum(np.bincount(hop_flows, minlength = len(flows))))).astype(np.int64)
+	# Aggregate results
+	flow_paths = {
+		"flows" : flows,
+		"sources" : sources,
+		"destinations" : destinations,
+		"path_offsets" : path_offsets,
+		"path_links" : hop_links[order].astype(np.int32),
+	}
+	# Return results
+	return flow_paths
+
+def compute_flow_paths(inputs, intermediates):
+	# Load inputs if not already loaded
+	required_inputs = ["traffic_by_chiplet"]
+	hlp.read_required_inputs(inputs, required_inputs)
+	traffic_by_chiplet = inputs["traffic_by_chiplet"]
+	# Compute intermediates if not already computed
+	required_intermediates = ["node_index", "next_hops"]
+	hlp.compute_required_intermediates(inputs, intermediates, required_intermediates)
+	node_index = intermediates["node_index"]
+	next_hops = intermediates["next_hops"]
+	# Compile the paths of all flows in the traffic
+	flow_paths = compile_flow_paths(next_hops, node_index, list(traffic_by_chiplet.keys()))
+	# Return results
+	return flow_paths
+
+# Construct the flows-by-links incidence matrix in CSR format: Row i contains a one for each link on the path of flow i
+def construct_flow_link_matrix(flow_paths, n_links):
+	# The compiled flow paths already have the layout of a CSR matrix
+	flow_link_matrix = {
+		"shape" : (len(flow_paths["flows"]), n_links),
+		"indptr" : flow_paths["path_offsets"],
+		"indices" : flow_paths["path_links"],
+		"data" : np.ones(len(flow_paths["path_links"]), dtype = float),
+	}
+	return flow_link_matrix
+
+def compute_flow_link_matrix(inputs, intermediates):
+	# Compute intermediates if not already computed
+	required_intermediates = ["node_index", "flow_paths"]
+	hlp.compute_required_intermediates(inputs, intermediates, required_intermediates)
+	node_index = intermediates["node_index"]
+	flow_paths = intermediates["flow_paths"]
+	# Construct the incidence matrix
+	flow_link_matrix = construct_flow_link_matrix(flow_paths, len(node_index["links"]))
+	# Return results
+	return flow_link_matrix
+
+# Latency of each chiplet as an endpoint (indexed by chiplet id) and relay-latency of each node (indexed by node id)
+def compute_node_latencies(inputs, intermediates):
+	# Load inputs if not already loaded
+	required_inputs = ["chiplets","packaging","placement","technologies"]
+	hlp.read_required_inputs(inputs, required_inputs)
+	chiplets = inputs["chiplets"]
+	packaging = inputs["packaging"]
+	placement = inputs["placement"]
+	technologies = inputs["technologies"]
+	# Compute relay-latency (for intermediate nodes) and latency (for endpoints) of each node
+	node_latencies = []
+	node_relay_latencies = []
+	# Add latency and relay-latency of chiplets
+	for (cid, chiplet_desc) in enumerate(placement["chiplets"]):
+		chiplet = chiplets[chiplet_desc["name"]]
+		lat_int = chiplet["internal_latency"]
+		lat_phy = technologies[chiplet["technology"]]["phy_latency"]
+		node_latencies.append(lat_int + lat_phy)
+		node_relay_latencies.append(lat_phy + lat_int + lat_phy)
+	# Add relay-latency of interposer-routers (they do not have a regular latency, as they can't be endpoints)
+	lat_ir = packaging["latency_irouter"]
+	for rid in range(len(placement["interposer_routers"])):
+		node_relay_latencies.append(lat_ir)
+	# Return results
+	return {"endpoint" : np.array(node_latencies), "relay" : np.array(node_relay_latencies)}
 
 def compute_area(inputs, intermediates):
 	# Load inputs if not already loaded
@@ -183,7 +394,7 @@ def compute_power_summary(inputs, intermediates):
 	if packaging["link_power_type"] == "constant":
 		total_link_power = len(link_lengths) * packaging["link_power"] / 2
 	else:
-		total_link_power = sum([eval(packaging["link_power"])(link_length) for link_length in link_lengths.values()]) / 2
+		total_link_power = sum(hlp.apply_packaging_expression(packaging["link_power"], link_lengths.tolist()).tolist()) / 2
 	# Compute total interposer area
 	total_power = total_chiplet_power + total_interposer_power
 	# Aggregate the results
@@ -197,8 +408,9 @@ def compute_power_summary(inputs, intermediates):
 
 def compute_link_summary(inputs, intermediates):
 	# Compute intermediates if not already computed
-	required_intermediates = ["link_lengths", "link_bandwidths"]
+	required_intermediates = ["node_index", "link_lengths", "link_bandwidths"]
 	hlp.compute_required_intermediates(inputs, intermediates, required_intermediates)
+	links = intermediates["node_index"]["links"]
 	link_lengths = intermediates["link_lengths"]
 	link_bandwidths = intermediates["link_bandwidths"]
 	print("Computing link summary...") if inputs["verbose"] else None
@@ -207,15 +419,15 @@ def compute_link_summary(inputs, intermediates):
 		data = {"lengths" : link_lengths, "bandwidths" : link_bandwidths}[metric]
 		# Compute a histogram of link lengths/bandwidths, round lengths to 1um (lengths are in mm) and bandwidths to 0.001 bit/cycle
 		histogram = {}
-		for link in [link for link in data.keys() if link[0] < link[1]]:
-			value = round(data[link],3)
+		for lid in [lid for (lid, link) in enumerate(links) if link[0] < link[1]]:
+			value = round(data[lid].item(),3)
 			if value not in histogram:
 				histogram[value] = 0
 			histogram[value] += 1
 		# Aggregate results
 		summary = {
 			"min" : min(histogram.keys()),
-			"avg" : sum(data.values()) / len(data),
+			"avg" : sum(data.tolist()) / len(data),
 			"max" : max(histogram.keys()),
 			"histogram" : histogram
 		}
@@ -289,164 +501,264 @@ def compute_cost(inputs, intermediates):
 	# Return results
 	return cost_summary
 
+# Compute the latency (in cycles) of each flow in the compiled flow paths
+def compute_flow_latencies(inputs, intermediates, flow_paths):
+	# Compute intermediates if not already computed
+	required_intermediates = ["node_index", "link_latencies", "node_latencies"]
+	hlp.compute_required_intermediates(inputs, intermediates, required_intermediates)
+	node_index = intermediates["node_index"]
+	link_latencies = intermediates["link_latencies"]
+	node_relay_latencies = intermediates["node_latencies"]["relay"]
+	# Latency of traversing a link plus the relay latency of the node at the end of the link
+	hop_latencies = link_latencies + node_relay_latencies[node_index["link_dst"]]
+	# Sum up the hop latencies along the path of each flow
+	path_offsets = flow_paths["path_offsets"]
+	cumulative_latencies = np.concatenate(([0], np.cumsum(hop_latencies[flow_paths["path_links"]])))
+	path_latencies = cumulative_latencies[path_offsets[1:]] - cumulative_latencies[path_offsets[:-1]]
+	# The destination chiplet does not relay the packet, it is an endpoint
+	dst_relay_latencies = node_relay_latencies[flow_paths["destinations"]]
+	path_latencies = path_latencies - np.where(path_offsets[1:] > path_offsets[:-1], dst_relay_latencies, 0)
+	# Add the latencies at the source and destination chiplets
+	flow_latencies = path_latencies + compute_endpoint_latencies(inputs, intermediates, flow_paths["sources"], flow_paths["destinations"])
+	# Return results
+	return flow_latencies
+
+# Latency of sending a packet from the source node to the central router of the source chiplet (1 cycle),
+# latency of the source and destination chiplets' central routers, latency of sending a packet from the
+# destination chiplet's central router to the destination node (1 cycle), and one cycle to eject the packet
+def compute_endpoint_latencies(inputs, intermediates, sources, destinations):
+	# Compute intermediates if not already computed
+	required_intermediates = ["node_latencies"]
+	hlp.compute_required_intermediates(inputs, intermediates, required_intermediates)
+	node_latencies = intermediates["node_latencies"]["endpoint"]
+	# Return results
+	return node_latencies[sources] + node_latencies[destinations] + 3
+
+# Group flows by destination chiplet, yields each destination together with the ids of its flows
+def group_flows_by_destination(destinations):
+	order = np.argsort(destinations, kind = "stable")
+	(dids, starts) = np.unique(destinations[order], return_index = True)
+	return zip(dids.tolist(), np.split(order, starts[1:]))
+
+# State graph of the routing towards one destination chiplet. For "default" and "algorithmic" routing tables, the
+# states are the nodes, for "extended" routing tables, the states are (node, input port) pairs with id
+# node * n_ports + port. For each state, we store the next state and the link that is taken (-1 if the routing table
+# has no valid next hop).
+# All states of the destination node are roots.
+def construct_routing_state_graph(node_index, next_hops_, did):
+	routing_table_type = next_hops_["type"]
+	n_nodes = len(node_index["nodes"])
+	if routing_table_type == "default":
+		n_ports = 1
+		nxt_nodes = next_hops_["next_hops"][:, did]
+	elif routing_table_type == "extended":
+		n_ports = next_hops_["next_hops"].shape[2]
+		nxt_nodes = next_hops_["next_hops"][:, did, :].ravel()
+	elif routing_table_type == "algorithmic":
+		n_ports = 1
+		nxt_nodes = ar.compute_algorithmic_next_hops(next_hops_["routing_table"], np.arange(n_nodes), np.full(n_nodes, did))
+	else:
+		print("ERROR: Unknown routing table type %s" % routing_table_type)
+		sys.exit(1)	
+	cur_nodes = np.repeat(np.arange(n_nodes), n_ports)
+	positions = hlp.find_adjacency_positions(node_index, cur_nodes, nxt_nodes)
+	is_valid = positions >= 0
+	state_links = np.where(is_valid, node_index["adj_links"][positions], -1)
+	next_states = nxt_nodes * n_ports + (node_index["link_in_ports"][state_links] if n_ports > 1 else 0)
+	next_states = np.where(is_valid, next_states, -1)
+	# Roots point to themselves
+	is_root = cur_nodes == did
+	state_ids = np.arange(len(cur_nodes))
+	next_states[is_root] = state_ids[is_root]
+	state_links[is_root] = -1
+	# Aggregate results
+	state_graph = {
+		"n_ports" : n_ports,
+		"next_nodes" : nxt_nodes,
+		"next_states" : next_states,
+		"state_links" : state_links,
+		"is_root" : is_root,
+	}
+	return state_graph
+
+# Sum up a per-state value along the route from each state to the destination using pointer jumping, i.e., after
+# k rounds, each state points to the state 2^k hops further along its route. Also returns whether each state
+# reaches the destination (states without a valid next hop and states on a loop do not).
+def accumulate_along_routes(state_graph, values):
+	next_states = state_graph["next_states"].copy()
+	is_root = state_graph["is_root"]
+	# States without a valid next hop point to themselves but they are no roots
+	is_invalid = next_states < 0
+	next_states[is_invalid] = np.nonzero(is_invalid)[0]
+	sums = np.where(is_invalid | is_root, 0, values)
+	# After ceil(log2(number of states)) rounds, all routes without a loop have reached their root
+	for _ in range(int(math.ceil(math.log2(max(len(next_states), 2))))):
+		jumped_states = next_states[next_states]
+		if np.array_equal(jumped_states, next_states):
+			break
+		sums = sums + sums[next_states]
+		next_states = jumped_states
+	return (sums, is_root[next_states])
+
+# Compute the latency (in cycles) of each flow using the routing in-tree of each destination instead of walking each
+# path. The path latencies from all states to the destination are summed up along the in-tree at once. With an
+# "extended" routing table, the next hop also depends on the input port, hence, the states are (node, port) pairs.
+def compute_flow_latencies_by_tree(inputs, intermediates, flows):
+	# Compute intermediates if not already computed
+	required_intermediates = ["node_index", "next_hops", "link_latencies", "node_latencies"]
+	hlp.compute_required_intermediates(inputs, intermediates, required_intermediates)
+	node_index = intermediates["node_index"]
+	next_hops = intermediates["next_hops"]
+	link_latencies = intermediates["link_latencies"]
+	node_relay_latencies = intermediates["node_latencies"]["relay"]
+	# Chiplet c has node id c
+	sources = np.array([sid for (sid, did) in flows], dtype = np.int64)
+	destinations = np.array([did for (sid, did) in flows], dtype = np.int64)
+	# Compute the path latency (links and relaying nodes) of all flows towards one destination at a time
+	path_latencies = np.zeros(len(flows), dtype = (link_latencies[:0] + node_relay_latencies[:0]).dtype)
+	for (did, fids) in group_flows_by_destination(destinations):
+		state_graph = construct_routing_state_graph(node_index, next_hops, did)
+		state_links = state_graph["state_links"]
+		next_nodes = state_graph["next_nodes"]
+		# Link latency plus the relay latency of the next node (unless it is the destination)
+		hop_latencies = link_latencies[state_links] + np.where(next_nodes != did, node_relay_latencies[next_nodes], 0)
+		(state_latencies, reaches_destination) = accumulate_along_routes(state_graph, hop_latencies)
+		# Packets are injected through port 0
+		src_states = sources[fids] * state_graph["n_ports"]
+		check_routes(flows, fids, reaches_destination[src_states])
+		path_latencies[fids] = state_latencies[src_states]
+	# Add the latencies at the source and destination chiplets
+	flow_latencies = path_latencies + compute_endpoint_latencies(inputs, intermediates, sources, destinations)
+	# Return results
+	return flow_latencies
+
+# Make sure that the routing table contains a route for each given flow
+def check_routes(flows, fids, reaches_destination):
+	if not np.all(reaches_destination):
+		print("ERROR: The routing table does not contain a valid route from chiplet %d to chiplet %d" % flows[fids[np.argmin(reaches_destination)]])
+		sys.exit(1)
+
+# Compute the lowest link-throughput per unit of traffic. The link loads can contain one column per traffic pattern.
+def compute_min_link_throughput(inputs, intermediates, link_loads):
+	# Compute intermediates if not already computed
+	required_intermediates = ["link_bandwidths"]
+	hlp.compute_required_intermediates(inputs, intermediates, required_intermediates)
+	link_bandwidths = intermediates["link_bandwidths"]
+	# Find the link-throughputs
+	bandwidths = link_bandwidths.reshape((-1,) + (1,) * (link_loads.ndim - 1))
+	link_throughputs = np.full(link_loads.shape, float("inf"))
+	np.divide(np.broadcast_to(bandwidths, link_loads.shape), link_loads, out = link_throughputs, where = link_loads > 0)
+	# The throughput is limited by the link with the lowest throughput per unit of traffic
+	return np.min(link_throughputs, axis = 0)
+
 def compute_latency(inputs, intermediates):
 	# Load inputs if not already loaded
-	required_inputs = ["chiplets","packaging","placement","routing_table","technologies","traffic_by_chiplet"]
+	required_inputs = ["traffic_by_chiplet"]
 	hlp.read_required_inputs(inputs, required_inputs)
-	chiplets = inputs["chiplets"]
-	packaging = inputs["packaging"]
-	placement = inputs["placement"]
-	routing_table_ = inputs["routing_table"]
-	routing_table_type = routing_table_["type"]
-	routing_table = routing_table_["table"]
-	technologies = inputs["technologies"]
 	traffic_by_chiplet = inputs["traffic_by_chiplet"]
-	# Compute intermediates if not already computed
-	required_intermediates = ["link_latencies"]
-	hlp.compute_required_intermediates(inputs, intermediates, required_intermediates)
-	link_latencies = intermediates["link_latencies"]
+	latency_engine = inputs.get("latency_engine", "paths")
 	print("Computing latency...") if inputs["verbose"] else None
-	# Compute relay-latency (for intermediate nodes) and latency (for endpoints) of each node
-	node_latencies = {}
-	node_relay_latencies = {}
-	# Add relay-latency of interposer-routers (they do not have a regular latency, as they can't be endpoints)
-	lat_ir = packaging["latency_irouter"]
-	for rid in range(len(placement["interposer_routers"])):
-		node_relay_latencies[("irouter",rid)] = lat_ir
-	# Add latency and relay-latency of chiplets
-	for (cid, chiplet_desc) in enumerate(placement["chiplets"]):
-		chiplet = chiplets[chiplet_desc["name"]]
-		lat_int = chiplet["internal_latency"]
-		lat_phy = technologies[chiplet["technology"]]["phy_latency"]
-		node_latencies[("chiplet",cid)] = lat_int + lat_phy
-		node_relay_latencies[("chiplet",cid)] = lat_phy + lat_int + lat_phy
-	# The average latency under the specified routing and traffic
-	min_latency = float("inf")	
-	max_latency = -float("inf")
-	sum_of_weghted_latencies = 0
-	sum_of_weights = 0
-	# Iterate through pairs of communicating chiplets
-	for (sid, did) in traffic_by_chiplet.keys():
-		src_node = ("chiplet",sid)
-		dst_node = ("chiplet",did)
-		# Latency of sending a packet from the source node to the centra router of the source chiplet
-		lat = 1
-		# Latency of source chiplet's central router
-		lat += node_latencies[("chiplet",sid)]
-		# Latency of links and intermediate nodes
-		prv_node = "-1"
-		cur_node = src_node
-		while cur_node != dst_node:
-			if routing_table_type == "default":
-				nxt_node = tuple(routing_table[cur_node][dst_node])
-			elif routing_table_type == "extended":
-				nxt_node = tuple(routing_table[cur_node][dst_node][prv_node])
-			else:
-				print("ERROR: Unknown routing table type %s" % routing_table_type)
-				sys.exit(1)	
-			# Add link latency
-			lat += link_latencies[(cur_node,nxt_node)]
-			# Add relay latency
-			if nxt_node != dst_node:
-				lat += node_relay_latencies[nxt_node]
-			# Move to the next node
-			prv_node = cur_node
-			cur_node = nxt_node
-		# Latency of destination chiplet's central router
-		lat += node_latencies[("chiplet",did)]
-		# Latency of sending a packet from the destination chiplet's central router to the destination node
-		lat += 1
-		# Finally, one cycle to eject the packet at the destination node
-		lat += 1
-		# Update the average latency
-		min_latency = min(min_latency, lat)
-		max_latency = max(max_latency, lat)
-		sum_of_weghted_latencies += lat * traffic_by_chiplet[(sid,did)]
-		sum_of_weights += traffic_by_chiplet[(sid,did)]
-	# Compute the average latency	
-	avg_latency = sum_of_weghted_latencies / sum_of_weights
+	# Compute the latency of each pair of communicating chiplets
+	if latency_engine == "paths":
+		required_intermediates = ["flow_paths"]
+		hlp.compute_required_intermediates(inputs, intermediates, required_intermediates)
+		flows = intermediates["flow_paths"]["flows"]
+		latencies = compute_flow_latencies(inputs, intermediates, intermediates["flow_paths"])
+	elif latency_engine == "tree":
+		flows = list(traffic_by_chiplet.keys())
+		latencies = compute_flow_latencies_by_tree(inputs, intermediates, flows)
+	else:
+		print("ERROR: Unknown latency engine %s" % latency_engine)
+		sys.exit(1)
+	# Compute the average latency weighted by the traffic of each flow
+	weights = np.array([traffic_by_chiplet[flow] for flow in flows])
+	avg_latency = float(np.dot(latencies, weights) / np.sum(weights))
 	# Aggregate results
 	latency = {
-		"min" : min_latency,
+		"min" : np.min(latencies).item(),
 		"avg" : avg_latency,
-		"max" : max_latency
+		"max" : np.max(latencies).item()
 	}
 	# Return results
 	return latency
 
+# Compute the load of each link by accumulating the traffic of each subtree of the routing in-tree towards one
+# destination at a time, instead of walking each flow's path. For "extended" routing tables, the traffic is
+# accumulated on the state graph whose states are (node, input port) pairs.
+def compute_link_loads_by_tree(inputs, intermediates, traffic_by_chiplet):
+	# Compute intermediates if not already computed
+	required_intermediates = ["node_index", "next_hops"]
+	hlp.compute_required_intermediates(inputs, intermediates, required_intermediates)
+	node_index = intermediates["node_index"]
+	next_hops = intermediates["next_hops"]
+	flows = list(traffic_by_chiplet.keys())
+	traffic = np.array([traffic_by_chiplet[flow] for flow in flows], dtype = float)
+	# Chiplet c has node id c
+	sources = np.array([sid for (sid, did) in flows], dtype = np.int64)
+	destinations = np.array([did for (sid, did) in flows], dtype = np.int64)
+	# Accumulate the link loads of one destination at a time
+	link_loads = np.zeros(len(node_index["links"]))
+	for (did, fids) in group_flows_by_destination(destinations):
+		state_graph = construct_routing_state_graph(node_index, next_hops, did)
+		next_states = state_graph["next_states"]
+		state_links = state_graph["state_links"]
+		# Distance (in hops) from each state to the destination
+		(depths, reaches_destination) = accumulate_along_routes(state_graph, np.ones(len(next_states), dtype = np.int64))
+		# Packets are injected through port 0
+		src_states = sources[fids] * state_graph["n_ports"]
+		check_routes(flows, fids, reaches_destination[src_states])
+		# Traffic that enters the network at each state
+		subtree_loads = np.bincount(src_states, weights = traffic[fids], minlength = len(next_states))
+		# Push the accumulated traffic from the leaves of the tree towards the destination, one level at a time
+		states = np.nonzero(reaches_destination & ~state_graph["is_root"])[0]
+		states = states[np.argsort(-depths[states], kind = "stable")]
+		level_ends = np.concatenate((np.nonzero(np.diff(depths[states]))[0] + 1, [len(states)]))
+		level_start = 0
+		for level_end in level_ends.tolist():
+			level = states[level_start:level_end]
+			np.add.at(subtree_loads, next_states[level], subtree_loads[level])
+			level_start = level_end
+		link_loads += np.bincount(state_links[states], weights = subtree_loads[states], minlength = len(link_loads))
+	# Return results
+	return link_loads
+
+# Compute the load of each link under an injection rate of 1.0 using the selected throughput engine. The link loads are
+# an intermediate, such that the throughput and the saturation estimate of the BookSim simulation share them.
+def compute_link_loads(inputs, intermediates):
+	# Load inputs if not already loaded
+	required_inputs = ["traffic_by_chiplet"]
+	hlp.read_required_inputs(inputs, required_inputs)
+	traffic_by_chiplet = inputs["traffic_by_chiplet"]
+	throughput_engine = inputs.get("throughput_engine", "matrix")
+	if throughput_engine == "matrix":
+		# Compute intermediates if not already computed
+		required_intermediates = ["flow_paths", "flow_link_matrix"]
+		hlp.compute_required_intermediates(inputs, intermediates, required_intermediates)
+		flow_paths = intermediates["flow_paths"]
+		flow_link_matrix = intermediates["flow_link_matrix"]
+		# One sparse matrix-vector product with the traffic vector
+		traffic = np.array([traffic_by_chiplet[flow] for flow in flow_paths["flows"]], dtype = float)
+		link_loads = hlp.csr_transposed_matvec(flow_link_matrix, traffic)
+	elif throughput_engine == "tree":
+		link_loads = compute_link_loads_by_tree(inputs, intermediates, traffic_by_chiplet)
+	else:
+		print("ERROR: Unknown throughput engine %s" % throughput_engine)
+		sys.exit(1)
+	# Return results
+	return link_loads
+
 def compute_throughput(inputs, intermediates):
 	# Load inputs if not already loaded
-	required_inputs = ["routing_table","topology","traffic_by_chiplet"]
+	required_inputs = ["traffic_by_chiplet"]
 	hlp.read_required_inputs(inputs, required_inputs)
-	routing_table_ = inputs["routing_table"]
-	routing_table_type = routing_table_["type"]
-	routing_table = routing_table_["table"]
-	topology = inputs["topology"]
 	traffic_by_chiplet = inputs["traffic_by_chiplet"]
+	print("Computing throughput...") if inputs["verbose"] else None
 	# Compute intermediates if not already computed
-	required_intermediates = ["link_bandwidths"]
+	required_intermediates = ["link_loads"]
 	hlp.compute_required_intermediates(inputs, intermediates, required_intermediates)
-	link_bandwidths = intermediates["link_bandwidths"]
-	print("Computing throughput...") if inputs["verbose"] else None
-	# Compute per-link load under an injection rate of 1.0
-	link_loads = {}
-	# Initialize link loads with zero
-	for link in topology:
-		node_id_1 = (link["ep1"]["type"],link["ep1"]["outer_id"])
-		node_id_2 = (link["ep2"]["type"],link["ep2"]["outer_id"])
-		link_loads[(node_id_1,node_id_2)] = 0
-		link_loads[(node_id_2,node_id_1)] = 0
-	# Iterate through communicating chiplets and add link-loads on the path
-	for (sid, did) in traffic_by_chiplet.keys():
-		src_node = ("chiplet",sid)
-		dst_node = ("chiplet",did)
-		prv_node = "-1"
-		cur_node = src_node
-		while cur_node != dst_node:
-			if routing_table_type == "default":
-				nxt_node = tuple(routing_table[cur_node][dst_node])
-			elif routing_table_type == "extended":
-				nxt_node = tuple(routing_table[cur_node][dst_node][prv_node])
-			else:
-				print("ERROR: Unknown routing table type %s" % routing_table_type)
-				sys.exit(1)	
-			# Add the traffic load to the link
-			link_loads[(cur_node,nxt_node)] += traffic_by_chiplet[(sid,did)]
-			# Move to the next node
-			prv_node = cur_node
-			cur_node = nxt_node
-	# Find the link-throughputs 	
-	link_throughputs = {link : (link_bandwidths[link] / link_loads[link]) if link_loads[link] > 0 else float("inf") for link in link_loads.keys()}
-	# Find the per-flow throughputs
-	max_link_bandwidth = max(link_bandwidths.values()) 
-	# Iterate through communicating chiplets and sum up global throughput
-	# TODO: Old
-	"""
-	min_throughput_per_traffic_unit = float("inf")
-	for (sid, did) in traffic_by_chiplet.keys():
-		src_node = ("chiplet",sid)
-		dst_node = ("chiplet",did)
-		prv_node = "-1"
-		cur_node = src_node
-		flow_throughput_per_traffic_unit = max_link_bandwidth
-		#flow_throughput = min(flow_throughput, router_throughputs[cur_node])
-		while cur_node != dst_node:
-			if routing_table_type == "default":
-				nxt_node = tuple(routing_table[cur_node][dst_node])
-			elif routing_table_type == "extended":
-				nxt_node = tuple(routing_table[cur_node][dst_node][prv_node])
-			else:
-				print("ERROR: Unknown routing table type %s" % routing_table_type)
-				sys.exit(1)	
-			# Add the traffic load to the link
-			flow_throughput_per_traffic_unit = min(flow_throughput_per_traffic_unit, link_throughputs[(cur_node,nxt_node)])
-			# Move to the next node
-			prv_node = cur_node
-			cur_node = nxt_node
-		min_throughput_per_traffic_unit = min(min_throughput_per_traffic_unit, flow_throughput_per_traffic_unit)
-	"""
-	# TODO: New
-	min_throughput_per_traffic_unit = min(link_throughputs.values())	
+	link_loads = intermediates["link_loads"]
+	# Find the lowest link-throughput per unit of traffic
+	min_throughput_per_traffic_unit = float(compute_min_link_throughput(inputs, intermediates, link_loads))
 	aggregate_load = sum(traffic_by_chiplet.values())
 	# Compute the aggregate throughput in bits/cycle
 	aggregate_throughput = min_throughput_per_traffic_unit * aggregate_load
@@ -457,6 +769,70 @@ def compute_throughput(inputs, intermediates):
 	# Return results
 	return throughput
 
+# Evaluate the latency and throughput of multiple traffic patterns under the same routing in one batched pass.
+# The traffics map a name to a traffic_by_chiplet dictionary, the results map each name to its latency and throughput.
+def evaluate_traffic_batch(inputs, intermediates, traffics):
+	# Compute intermediates if not already computed
+	required_intermediates = ["node_index", "next_hops"]
+	hlp.compute_required_intermediates(inputs, intermediates, required_intermediates)
+	node_index = intermediates["node_index"]
+	next_hops = intermediates["next_hops"]
+	print("Computing latency and throughput of %d traffic patterns..." % len(traffics)) if inputs["verbose"] else None
+	# Compile the paths of all flows that are used by at least one traffic pattern
+	names = list(traffics.keys())
+	flows = list(dict.fromkeys([flow for name in names for flow in traffics[name]]))
+	flow_ids = {flow : fid for (fid, flow) in enumerate(flows)}
+	flow_paths = compile_flow_paths(next_hops, node_index, flows)
+	flow_link_matrix = construct_flow_link_matrix(flow_paths, len(node_index["links"]))
+	# Traffic matrix with one column per traffic pattern
+	traffic_matrix = np.zeros((len(flows), len(names)))
+	is_used = np.zeros((len(flows), len(names)), dtype = bool)
+	for (pid, name) in enumerate(names):
+		for (flow, load) in traffics[name].items():
+			traffic_matrix[flow_ids[flow], pid] = load
+			is_used[flow_ids[flow], pid] = True
+	# Latency: The latency of each flow only depends on the routing, it is weighted by each traffic pattern
+	latencies = compute_flow_latencies(inputs, intermediates, flow_paths)
+	avg_latencies = (latencies @ traffic_matrix) / np.sum(traffic_matrix, axis = 0)
+	# Throughput: Compute the link loads of all traffic patterns in one sparse matrix-matrix product
+	link_loads = hlp.csr_transposed_matmat(flow_link_matrix, traffic_matrix)
+	min_throughputs_per_traffic_unit = compute_min_link_throughput(inputs, intermediates, link_loads)
+	# Aggregate results
+	results = {}
+	for (pid, name) in enumerate(names):
+		used_latencies = latencies[is_used[:, pid]]
+		results[name] = {
+			"latency" : {
+				"min" : np.min(used_latencies).item(),
+				"avg" : float(avg_latencies[pid]),
+				"max" : np.max(used_latencies).item()
+			},
+			"throughput" : {
+				"aggregate_throughput" : float(min_throughputs_per_traffic_unit[pid]) * sum(traffics[name].values())
+			}
+		}
+	# Return results
+	return results
+
+
+# Estimate the saturation point as a BookSim injection rate (flits/cycle per unit) from the analytical aggregate
+# throughput (bits/cycle), assuming that a flit is as wide as the narrowest link
+def estimate_saturation_injection_rate(inputs, intermediates):
+	# Read inputs if not already loaded
+	required_inputs = ["chiplets","placement","traffic_by_chiplet"]
+	hlp.read_required_inputs(inputs, required_inputs)
+	chiplets = inputs["chiplets"]
+	placement = inputs["placement"]
+	# Compute intermediates if not already computed
+	required_intermediates = ["link_bandwidths", "link_loads"]
+	hlp.compute_required_intermediates(inputs, intermediates, required_intermediates)
+	link_bandwidth = float(np.min(intermediates["link_bandwidths"]))
+	# Compute the aggregate throughput from the link loads that are shared with the throughput metric
+	min_throughput_per_traffic_unit = float(compute_min_link_throughput(inputs, intermediates, intermediates["link_loads"]))
+	aggregate_throughput = min_throughput_per_traffic_unit * sum(inputs["traffic_by_chiplet"].values())
+	# Convert the throughput
+	n_units = sum([chiplets[chiplet["name"]]["unit_count"] for chiplet in placement["chiplets"]])
+	return aggregate_throughput / (link_bandwidth * n_units)
 
 def perform_booksim_simulation(inputs, intermediates):
 	run_identifier = inputs["design"]["design_name"]
@@ -464,34 +840,123 @@ def perform_booksim_simulation(inputs, intermediates):
 	required_inputs = ["booksim_config"]
 	hlp.read_required_inputs(inputs, required_inputs)
 	booksim_config = inputs["booksim_config"]
-	# Export the design to BookSim
-	port_map = bsw.export_booksim_topology(inputs, intermediates, run_identifier)
-	bsw.export_routing_table(inputs, intermediates, port_map, run_identifier)
-	if booksim_config["mode"] == "traffic":
-		bsw.export_traffic(inputs, intermediates, run_identifier)
-	else:
-		bsw.export_trace(inputs, intermediates, run_identifier)
-	# Perform the BookSim simulation
-	print("Performing BookSim simulation...") if inputs["verbose"] else None
-	bs_results = bsw.run_booksim_simulation(inputs, intermediates, run_identifier)
+	# The bisection search for the saturation point starts at the analytical estimate
+	saturation_estimate = None
+	if uses_saturation_estimate(booksim_config):
+		saturation_estimate = estimate_saturation_injection_rate(inputs, intermediates)
+	# All BookSim files are stored in a private run directory that is removed after the simulation
+	run_dir = bsw.create_run_directory(inputs, run_identifier)
+	try:
+		# Export the design to BookSim
+		port_map = bsw.export_booksim_topology(inputs, intermediates, run_dir)
+		bsw.export_routing_table(inputs, intermediates, port_map, run_dir)
+		if booksim_config["mode"] == "traffic":
+			bsw.export_traffic(inputs, intermediates, run_dir)
+		else:
+			bsw.export_trace(inputs, intermediates, run_dir)
+		# Perform the BookSim simulation
+		print("Performing BookSim simulation...") if inputs["verbose"] else None
+		bs_results = bsw.run_booksim_simulation(inputs, intermediates, run_dir, saturation_estimate)
+	finally:
+		bsw.remove_run_directory(inputs, run_dir)
 	# Return the results
 	return bs_results
 
 
-def rapidchiplet(inputs, intermediates, do_compute, results_file, verbose = False, validate = True):
+# Inputs and intermediates that an intermediate or metric depends on directly. The dependencies of the latency and the
+# link loads depend on the selected engine, the inputs of the BookSim simulation depend on the simulation mode.
+def get_dependencies(inputs, name):
+	if name == "latency":
+		engine = inputs.get("latency_engine", "paths")
+		if engine not in latency_engine_dependencies:
+			print("ERROR: Unknown latency engine %s" % engine)
+			sys.exit(1)
+		return latency_engine_dependencies[engine]
+	if name == "link_loads":
+		engine = inputs.get("throughput_engine", "matrix")
+		if engine not in throughput_engine_dependencies:
+			print("ERROR: Unknown throughput engine %s" % engine)
+			sys.exit(1)
+		return throughput_engine_dependencies[engine]
+	if name == "booksim_simulation":
+		hlp.read_required_inputs(inputs, ["booksim_config"])
+		traffic_input = "traffic_by_unit" if inputs["booksim_config"]["mode"] == "traffic" else "trace"
+		dependencies = metric_dependencies[name]
+		dependencies = {"inputs" : dependencies["inputs"] + [traffic_input], "intermediates" : list(dependencies["intermediates"])}
+		# The saturation estimate depends on the link loads that are shared with the throughput metric
+		if uses_saturation_estimate(inputs["booksim_config"]):
+			throughput_dependencies = metric_dependencies["throughput"]
+			dependencies["inputs"] += throughput_dependencies["inputs"]
+			dependencies["intermediates"] += throughput_dependencies["intermediates"]
+		return dependencies
+	return metric_dependencies[name]
+
+# The bisection search for the saturation point in BookSim's traffic mode is seeded by the analytical throughput
+def uses_saturation_estimate(booksim_config):
+	return booksim_config["mode"] == "traffic" and booksim_config.get("search", "sweep") == "bisection"
+
+# Compute the selected metrics and all intermediates they depend on as a DAG of tasks on a pool of threads.
+# All inputs are read up-front, a task is submitted as soon as all intermediates it depends on are available.
+def compute_metrics_in_parallel(inputs, intermediates, selected_metrics, workers):
+	# Collect the intermediates that the selected metrics depend on (transitively) and read all required inputs
+	dependencies = {}
+	unvisited = list(selected_metrics)
+	while len(unvisited) > 0:
+		name = unvisited.pop()
+		if name in dependencies:
+			continue
+		required = get_dependencies(inputs, name)
+		hlp.read_required_inputs(inputs, required["inputs"])
+		dependencies[name] = [x for x in required["intermediates"] if x not in intermediates]
+		unvisited += dependencies[name]
+	# Run a task, measure the time taken by metrics
+	def run_task(name):
+		start_time = time.time()
+		result = metric_computation_functions[name](inputs, intermediates)
+		if name in selected_metrics:
+			result["time_taken"] = time.time() - start_time
+		return result
+	# Schedule the tasks
+	outputs = {}
+	with concurrent.futures.ThreadPoolExecutor(max_workers = workers) as executor:
+		running = {}
+		while len(dependencies) > 0 or len(running) > 0:
+			# Submit all tasks whose dependencies are available
+			ready = [name for (name, deps) in dependencies.items() if all(dep in intermediates for dep in deps)]
+			for name in ready:
+				del dependencies[name]
+				running[executor.submit(run_task, name)] = name
+			# Wait for at least one task to complete
+			(finished, _) = concurrent.futures.wait(running, return_when = concurrent.futures.FIRST_COMPLETED)
+			for future in finished:
+				name = running.pop(future)
+				if name in selected_metrics:
+					outputs[name] = future.result()
+				else:
+					intermediates[name] = future.result()
+	# Return the outputs in the order of the metrics
+	return {metric : outputs[metric] for metric in selected_metrics}
+
+def rapidchiplet(inputs, intermediates, do_compute, results_file, verbose = False, validate = True, latency_engine = "paths", throughput_engine = "matrix", workers = 1):
 	total_start_time = time.time()
 	# Store verbose option in inputs
 	inputs["verbose"] = verbose
 	inputs["validate"] = validate
+	inputs["latency_engine"] = latency_engine
+	inputs["throughput_engine"] = throughput_engine
 	# Initialize outputs
 	outputs = {}
 	# Compute the selected metrics
-	for metric in metrics:
-		if do_compute[metric] and metric not in outputs:
-			start_time = time.time()
-			outputs[metric] = metric_computation_functions[metric](inputs, intermediates)
-			end_time = time.time()
-			outputs[metric]["time_taken"] = end_time - start_time
+	if workers > 1:
+		selected_metrics = [metric for metric in metrics if do_compute[metric]]
+		outputs = compute_metrics_in_parallel(inputs, intermediates, selected_metrics, workers)
+	else:
+		for metric in metrics:
+			if do_compute[metric] and metric not in outputs:
+				start_time = time.time()
+				outputs[metric] = metric_computation_functions[metric](inputs, intermediates)
+				end_time = time.time()
+				outputs[metric]["time_taken"] = end_time - start_time
 	# Store time taken
 	outputs["total_time_taken"] = time.time() - total_start_time
 	return outputs
@@ -502,10 +967,17 @@ metrics = ["area_summary", "power_summary", "link_summary", "cost", "latency", "
 # Define all functions that compute the metrics and the metrics themselves
 metric_computation_functions = {
 	# Intermediates
+	"node_index" : compute_node_index,
+	"phy_table" : compute_phy_table,
 	"link_lengths" : compute_link_lengths,
 	"link_latencies" : compute_link_latencies,
 	"link_bandwidths" : compute_link_bandwidths,
+	"next_hops" : compute_next_hops,
 	"area" : compute_area,
+	"flow_paths" : compute_flow_paths,
+	"flow_link_matrix" : compute_flow_link_matrix,
+	"node_latencies" : compute_node_latencies,
+	"link_loads" : compute_link_loads,
 	# Outputs
 	"area_summary" : compute_area_summary,
 	"power_summary" : compute_power_summary,
@@ -516,6 +988,36 @@ metric_computation_functions = {
 	"booksim_simulation" : perform_booksim_simulation,
 }
 
+# Define the inputs and intermediates that each intermediate and metric depends on
+metric_dependencies = {
+	# Intermediates
+	"node_index" : {"inputs" : ["chiplets","placement","topology"], "intermediates" : []},
+	"phy_table" : {"inputs" : ["chiplets","packaging","placement"], "intermediates" : []},
+	"link_lengths" : {"inputs" : ["packaging","placement","topology"], "intermediates" : ["node_index","phy_table"]},
+	"link_latencies" : {"inputs" : ["packaging"], "intermediates" : ["link_lengths"]},
+	"link_bandwidths" : {"inputs" : ["topology"], "intermediates" : ["node_index","phy_table"]},
+	"next_hops" : {"inputs" : ["routing_table"], "intermediates" : ["node_index"]},
+	"area" : {"inputs" : ["chiplets","placement"], "intermediates" : []},
+	"flow_paths" : {"inputs" : ["traffic_by_chiplet"], "intermediates" : ["node_index","next_hops"]},
+	"flow_link_matrix" : {"inputs" : [], "intermediates" : ["node_index","flow_paths"]},
+	"node_latencies" : {"inputs" : ["chiplets","packaging","placement","technologies"], "intermediates" : []},
+	# Outputs
+	"area_summary" : {"inputs" : [], "intermediates" : ["area"]},
+	"power_summary" : {"inputs" : ["chiplets","packaging","placement"], "intermediates" : ["link_lengths"]},
+	"link_summary" : {"inputs" : [], "intermediates" : ["node_index","link_lengths","link_bandwidths"]},
+	"cost" : {"inputs" : ["chiplets","packaging","placement","technologies"], "intermediates" : ["area"]},
+	"throughput" : {"inputs" : ["traffic_by_chiplet"], "intermediates" : ["link_loads","link_bandwidths"]},
+	"booksim_simulation" : {"inputs" : ["booksim_config","chiplets","packaging","placement","routing_table","technologies","topology"], "intermediates" : ["node_index","link_latencies","next_hops"]},
+}
+latency_engine_dependencies = {
+	"paths" : {"inputs" : ["traffic_by_chiplet"], "intermediates" : ["flow_paths","node_index","link_latencies","node_latencies"]},
+	"tree" : {"inputs" : ["traffic_by_chiplet"], "intermediates" : ["node_index","next_hops","link_latencies","node_latencies"]},
+}
+throughput_engine_dependencies = {
+	"matrix" : {"inputs" : ["traffic_by_chiplet"], "intermediates" : ["flow_paths","flow_link_matrix"]},
+	"tree" : {"inputs" : ["traffic_by_chiplet"], "intermediates" : ["node_index","next_hops"]},
+}
+
 if __name__ == "__main__":
 	# Read command line arguments
 	parser = argparse.ArgumentParser()
@@ -529,6 +1031,9 @@ if __name__ == "__main__":
 	parser.add_argument("-t", "--throughput", action="store_true", help = "Compute the ICI throughput")
 	parser.add_argument("-bs", "--booksim_simulation", action="store_true", help = "Simulate the design using BookSim")
 	parser.add_argument("-nv", "--no_validation", action="store_true", help = "Skip the validation of the design")
+	parser.add_argument("-le", "--latency_engine", default = "paths", choices = ["paths", "tree"], help = "Engine used to compute the latency")
+	parser.add_argument("-te", "--throughput_engine", default = "matrix", choices = ["matrix", "tree"], help = "Engine used to compute the throughput")
+	parser.add_argument("-w", "--workers", type = int, default = 1, help = "Number of threads used to compute independent metrics in parallel")
 	args = parser.parse_args()
 	do_compute = {metric : getattr(args, metric) for metric in metrics}
 	validate = not args.no_validation
@@ -536,7 +1041,7 @@ if __name__ == "__main__":
 	inputs = {"design" : hlp.read_json(filename = args.design_file)}
 	intermediates = {}
 	# Run the main function
-	results = rapidchiplet(inputs, intermediates, do_compute, args.results_file, verbose = True, validate = validate)
+	results = rapidchiplet(inputs, intermediates, do_compute, args.results_file, verbose = True, validate = validate, latency_engine = args.latency_engine, throughput_engine = args.throughput_engine, workers = args.workers)
 	# Store results
 	hlp.write_json("./results/%s.json" % args.results_file, results)
 
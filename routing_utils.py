@@ -1,26 +1,88 @@
 # Import python libraries
 import networkx as nx
 import itertools as it
-from copy import deepcopy
+import heapq
+from collections import deque
+
+#checks whether removing vertex v disconnects the graph with adjacency adj. one breadth-first search is started from
+#each neighbor of v (without passing through v) and the searches advance one vertex at a time in round-robin order.
+#searches that meet are merged. v is a cut vertex iff a search runs out of vertices before all searches are merged,
+#hence, the cost is bounded by the size of the smallest part that v separates from the rest, or by how close the
+#neighbors of v are to each other.
+def is_cut_vertex(adj, v):
+    neighbors = list(adj[v])
+    if len(neighbors) < 2:
+        return False
+    owner = {v : -1}
+    group = list(range(len(neighbors)))
+    frontiers = {}
+    for (i, w) in enumerate(neighbors):
+        owner[w] = i
+        frontiers[i] = deque([w])
+    def find(i):
+        while group[i] != i:
+            group[i] = group[group[i]]
+            i = group[i]
+        return i
+    while True:
+        for i in list(frontiers.keys()):
+            if i not in frontiers:
+                continue
+            if len(frontiers[i]) == 0:
+                return True
+            u = frontiers[i].popleft()
+            for w in adj[u]:
+                if w not in owner:
+                    owner[w] = i
+                    frontiers[i].append(w)
+                elif owner[w] >= 0:
+                    j = find(owner[w])
+                    if j != i:
+                        #merge the smaller frontier into the larger one
+                        if len(frontiers[i]) < len(frontiers[j]):
+                            (frontiers[i], frontiers[j]) = (frontiers[j], frontiers[i])
+                        frontiers[i].extend(frontiers.pop(j))
+                        group[j] = i
+                        if len(frontiers) == 1:
+                            return False
 
 #modifies the parameter graph, returns a cycle breaking set of turns for G
+#in each step, a non cut vertex of minimum degree is removed (the first in the order of G.nodes() that satisfies the
+#inequality from the paper). instead of recomputing all cut vertices in each step, the vertices are kept in one heap per
+#degree, ordered by their position in G.nodes(), and only the vertices that are inspected are checked for being a cut vertex.
 def simple_cycle_breaking(G, forbidden_turns):
-    #end of recursion
-    if G.number_of_nodes() == 2:
-        return
-    else:
-        #compute all cut nodes:
-        cut_vertices = (list(nx.articulation_points(G)))
-        #compute a min deg non cut vertice 
-        min_deg = min([G.degree(x) for x in list(G.nodes()) if x not in cut_vertices])
-        non_cut_min_vertices = [x for x in list(G.nodes()) if x not in cut_vertices and G.degree(x) == min_deg]
-        
-        #find vertex for step 2 in algo
+    adj = G.adj
+    position = {x : i for (i, x) in enumerate(G.nodes())}
+    #heaps of (position, vertex) by degree. degrees only decrease, entries whose degree changed are skipped.
+    heaps = {}
+    for x in G.nodes():
+        heaps.setdefault(len(adj[x]), []).append((position[x], x))
+    for heap in heaps.values():
+        heapq.heapify(heap)
+
+    while G.number_of_nodes() > 2:
+        #find a min deg non cut vertice that satisfies the ineq from the paper
         chosen_vertex = -1
-        for x in non_cut_min_vertices:
-            #check if ineq from paper
-            if G.degree(x) <= sum([G.degree(v)-1 for v in G[x]]):
-                chosen_vertex = x
+        for deg in sorted(heaps.keys()):
+            inspected = []
+            has_non_cut_vertex = False
+            while heaps[deg]:
+                (pos, x) = heapq.heappop(heaps[deg])
+                if x not in adj or len(adj[x]) != deg:
+                    continue
+                inspected.append((pos, x))
+                if not is_cut_vertex(adj, x):
+                    has_non_cut_vertex = True
+                    #check if ineq from paper
+                    if deg <= sum([len(adj[v])-1 for v in adj[x]]):
+                        chosen_vertex = x
+                        break
+            for entry in inspected:
+                heapq.heappush(heaps[deg], entry)
+            if len(heaps[deg]) == 0:
+                del heaps[deg]
+            #the min deg is the lowest degree of any non cut vertex
+            if has_non_cut_vertex:
                 break
         assert(chosen_vertex != -1)
         #add forbidden turns to forbidden turn list
@@ -28,29 +90,53 @@ def simple_cycle_breaking(G, forbidden_turns):
             forbidden_turns.append(((neigh1,chosen_vertex), (chosen_vertex, neigh2)))
             forbidden_turns.append(((neigh2,chosen_vertex), (chosen_vertex, neigh1)))
 
+        neighbors = list(adj[chosen_vertex])
         G.remove_node(chosen_vertex)
-        simple_cycle_breaking(G, forbidden_turns)
+        for v in neighbors:
+            heapq.heappush(heaps.setdefault(len(adj[v]), []), (position[v], v))
 
 # corresponds one to one to the cpp booksim code.
+# the turns (v1,v2) -> (v2,v3) with v1 != v3 are enumerated from the in-edges and out-edges of each node v2, which takes
+# O(sum of squared degrees) time. in- and out-neighbors are sorted by their position in G.nodes(), such that the
+# successors and predecessors of each node of the line graph are in the same order as in a triple loop over all nodes.
 def generate_line_graph(G: nx.DiGraph):
     LG = nx.DiGraph()
     for e in G.edges():
         LG.add_node(e)
 
-    for v1 in G.nodes():
-        for v2 in G.nodes():
-            for v3 in G.nodes():
-                if v1 != v3 and (v1,v2) in G.edges() and (v2,v3) in G.edges():
+    node_order = {v : i for (i, v) in enumerate(G.nodes())}
+    for v2 in G.nodes():
+        in_nodes = sorted(G.predecessors(v2), key = node_order.get)
+        out_nodes = sorted(G.successors(v2), key = node_order.get)
+        for v1 in in_nodes:
+            for v3 in out_nodes:
+                if v1 != v3:
                     LG.add_edge((v1,v2),(v2,v3))
 
     return LG
 
-# computes the predecessor map for all paths starting from chiplets. nx.predecessor computes the predecessor map containing all possible predecesssors on
-# shortest paths from src to other nodes. note that this is called on the dual graph and thus the starting point in the algo corresponds to an edge in the original graph.
-def get_shortest_valid_paths(LG, chiplets, src, pred_map):
-    #now compute minimal paths for each pair of nodes in the graph. first iterate over all pairs of nodes:
-    for u in chiplets:
-        pred_map[u] = deepcopy(nx.predecessor(LG,(src,u)))
-        
-            
-    
+# breadth-first search from the source on a graph with integer node ids, where succ[x] lists the successors of node x.
+# note that this is called on the dual graph and thus the starting point corresponds to an edge in the original graph.
+# returns the distance of each node from the source (-1 if it is unreachable) and the position of each node in the
+# order in which the nodes are discovered.
+def get_shortest_path_distances(succ, source):
+    dists = [-1] * len(succ)
+    ranks = [-1] * len(succ)
+    dists[source] = 0
+    ranks[source] = 0
+    order = [source]
+    head = 0
+    while head < len(order):
+        x = order[head]
+        head += 1
+        for y in succ[x]:
+            if dists[y] < 0:
+                dists[y] = dists[x] + 1
+                ranks[y] = len(order)
+                order.append(y)
+    return (dists, ranks)
+
+# predecessors of node x on shortest paths from the source, derived from the distances instead of storing them.
+# the predecessors are sorted by their discovery order, which is the order of the predecessor lists of nx.predecessor.
+def get_shortest_path_predecessors(pred, dists, ranks, x):
+    return sorted([v for v in pred[x] if dists[v] == dists[x] - 1], key = ranks.__getitem__)
@@ -1,9 +1,11 @@
 # Import python libraries
 import sys
 import math
+import numpy as np
 
 # Import RapidChiplet files
 import helpers as hlp
+import algorithmic_routing as ar
 
 # Print validation error 
 def print_validation_error(message, args):
@@ -110,7 +112,7 @@ def validate_packaging(inputs):
 	# If the link_latency_type is function, the function must be valid
 	if packaging["link_latency_type"] == "function":
 		try:
-			tmp = int(math.ceil(eval(packaging["link_latency"])(3)))
+			tmp = int(math.ceil(hlp.compile_packaging_expression(packaging["link_latency"])(3)))
 		except:
 			msg = "Invalid link latency function \"%s\". Unable to evaluate function."
 			args = (packaging["link_latency"], )
@@ -125,7 +127,7 @@ def validate_packaging(inputs):
 	# If the link_power_type is function, the function must be valid
 	if packaging["link_power_type"] == "function":
 		try:	
-			tmp = int(math.ceil(eval(packaging["link_power"])(3)))
+			tmp = int(math.ceil(hlp.compile_packaging_expression(packaging["link_power"])(3)))
 		except:
 			msg = "Invalid link power function \"%s\". Unable to evaluate function."
 			args = (packaging["link_power"], )
@@ -229,11 +231,32 @@ def validate_routing_table(inputs):
 	placement = inputs["placement"]
 	routing_table_ = inputs["routing_table"]
 	routing_table_type = routing_table_["type"]
-	routing_table = routing_table_["table"]
+	routing_table = routing_table_.get("table", None)
 	topology = inputs["topology"]
 	print("Validating routing table...", end = "") if inputs["verbose"] else None
 	# Count the number of errors
 	errors = 0
+	# Algorithmic routing tables: Check that the routing fits the design and that all next hops are neighbors
+	if routing_table_type == "algorithmic":
+		node_index = hlp.construct_node_index(chiplets, placement, topology)
+		problems = ar.check_algorithmic_routing(routing_table_, node_index)
+		for problem in problems:
+			print_validation_error("%s", (problem, ))
+			errors += 1
+		if len(problems) == 0:
+			n_nodes = len(node_index["nodes"])
+			for did in range(n_nodes):
+				cur_nodes = np.arange(n_nodes)
+				nxt_nodes = ar.compute_algorithmic_next_hops(routing_table_, cur_nodes, np.full(n_nodes, did))
+				is_invalid = (hlp.find_adjacency_positions(node_index, cur_nodes, nxt_nodes) < 0) & (cur_nodes != did)
+				for cid in np.nonzero(is_invalid)[0].tolist():
+					msg = "The algorithmic routing uses a link that is not present in the topology. Link: %s -> %s"
+					print_validation_error(msg, (("chiplet", cid), ("chiplet", int(nxt_nodes[cid]))))
+					errors += 1
+		print(" completed with %d errors." % errors) if inputs["verbose"] else None
+		if errors > 0:
+			print("Note that RapidChiplet might produce incorrect results or crash when running with invalid inputs.")
+		return
 	# Check that all chiplets contain a next-hop entry for all possible destinations	
 	for (cid1, cdesc1) in enumerate(placement["chiplets"]):
 		# Check that the chiplet contains a routing table entry
@@ -300,6 +323,9 @@ def validate_routing_table(inputs):
 					possible_next_nodes = [routing_table[node1][node2]]
 				elif routing_table_type == "extended":
 					possible_next_nodes = [routing_table[node1][node2][prev] for prev in routing_table[node1][node2]]
+				elif routing_table_type == "compressed":
+					entry = routing_table[node1][node2]
+					possible_next_nodes = [x for x in [entry["default"]] + list(entry["exceptions"].values()) if x is not None]
 				else:
 					print("ERROR: Invalid routing table type \"%s\"." % routing_table_type)
 					sys.exit(1)
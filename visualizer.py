@@ -10,6 +10,7 @@ import matplotlib.patches as ptch
 # Import RapidChiplet files
 import global_config as cfg
 import helpers as hlp
+import algorithmic_routing as ar
 
 # Visualize a single chiplet
 def visualize_design(inputs, design_name, show_chiplet_id = False, show_phy_id = False):
@@ -129,6 +130,18 @@ def visualize_routing_tables(routing_table_type, routing_table):
 							print(" => no route")
 					else:
 						print(" => next hop %s %d" % routing_table[cur][dst][prev])
+			elif routing_table_type == "compressed":
+				entry = routing_table[cur][dst]
+				print(" => next hop %s %d" % entry["default"] if entry["default"] != None else " => no route")
+				for prev in entry["exceptions"]:
+					if prev == "-1":
+						print("  Previous local", end = " ")
+					else:
+						print("  Previous %s %d" % prev, end = " ")
+					if entry["exceptions"][prev] == None:
+						print(" => no route")
+					else:
+						print(" => next hop %s %d" % entry["exceptions"][prev])
 			else:
 				print("ERROR: Unknown routing table type \"%s\"." % routing_table_type)
 	
@@ -138,12 +151,35 @@ if __name__ == "__main__":
 	parser.add_argument("-df", "--design_file", required = False, help = "Path to the \"design\" input file") 
 	parser.add_argument("-cf", "--chiplet_file", required = False, help = "Path to the \"chiplets\" input file") 
 	parser.add_argument("-cn", "--chiplet_name", required = False, help = "Name of the chiplet to visualize") 
-	parser.add_argument("-rtf", "--routing_table_file", required = False, help = "Path to the \"routing_table\" input file")
+	parser.add_argument("-rtf", "--routing_table_file", required = False, help = "Path to the \"routing_table\" input file (.npy tables also need the design_file)")
 	parser.add_argument("-sci", "--show_chiplet_id", required = False, action = "store_true", help = "Show chiplet IDs")
 	parser.add_argument("-spi", "--show_phy_id", required = False, action = "store_true", help = "Show PHY IDs")
 	args = parser.parse_args()
+	# Check if the routing_table_file argument was provided
+	if args.routing_table_file != None:
+		# Read the routing table file. A .npy routing table is read like any other input of a design, as the nodes of
+		# the design are needed to interpret the array.
+		if args.routing_table_file.endswith(".npy"):
+			if args.design_file == None:
+				print("error: The \"design_file\" argument is required to visualize a .npy routing table.")
+				sys.exit()
+			design = hlp.read_json(filename = args.design_file)
+			design["routing_table"] = args.routing_table_file
+			inputs = {"design":design,"verbose":False,"validate":False}
+			hlp.read_required_inputs(inputs, ["routing_table"])
+			routing_table_ = inputs["routing_table"]
+		else:
+			routing_table_ = hlp.read_json(filename = args.routing_table_file)
+		# Algorithmic routing tables only store the parameters of the algorithm, they are expanded into "default" tables
+		if routing_table_["type"] == "algorithmic":
+			print("Algorithmic routing for a %s on a %dx%d grid" % (routing_table_["topology"], routing_table_["rows"], routing_table_["cols"]))
+			routing_table_ = ar.expand_algorithmic_routing(routing_table_)
+		routing_table_type = routing_table_["type"]
+		routing_table = routing_table_["table"]
+		# Visualize the routing tables
+		visualize_routing_tables(routing_table_type, routing_table)
 	# Check if the design_file argument was provided
-	if args.design_file != None:
+	elif args.design_file != None:
 		# Read the design file
 		design = hlp.read_json(filename = args.design_file)
 		inputs = {"design":design,"verbose":True,"validate":True}
@@ -159,13 +195,6 @@ if __name__ == "__main__":
 		else:
 			print("error: The chiplet \"%s\" was not found in the chiplet file \"%s\"." % (args.chiplet_name, args.chiplet_file))
 			sys.exit()
-	elif args.routing_table_file != None:
-		# Read the routing table file
-		routing_table_ = hlp.read_json(filename = args.routing_table_file)
-		routing_table_type = routing_table_["type"]
-		routing_table = routing_table_["table"]
-		# Visualize the routing tables
-		visualize_routing_tables(routing_table_type, routing_table)
 	else:
-		print("error: Either the \"design_file\" or the \"chiplet_file\" and \"chiplet_name\" arguments must be provided.")
+		print("error: Either the \"design_file\", the \"routing_table_file\", or the \"chiplet_file\" and \"chiplet_name\" arguments must be provided.")
 		sys.exit()	